@@ -0,0 +1,10 @@
+"""Нагрузочные замеры публичных страниц.
+
+    python -m benchmarks seed --users 1000 --posts 50
+    python -m benchmarks run --requests 500 --concurrency 8 -o report.json
+    python -m benchmarks mixed --write-ratio 0.2 [--baseline]
+
+Данные пишутся в отдельную базу (по умолчанию benchmark.sqlite3
+в корне проекта) со своим файлом кэша, рабочая база не затрагивается.
+Отчёты в JSON можно сравнивать между коммитами.
+"""
@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.path.join(BASE_DIR, 'benchmark.sqlite3')
+
+
+def configure(database, cache=True, baseline=False):
+    """Направляет проект на отдельную базу и кэш до запуска Django.
+    baseline возвращает SQLite к настройкам по умолчанию: журнал
+    отката, отложенные транзакции и запись без очереди."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    sys.path.insert(0, BASE_DIR)
+    from django.conf import settings
+    settings.DEBUG = False
+    settings.DATABASES['default']['NAME'] = database
+    if baseline:
+        settings.DATABASES['default']['ENGINE'] = 'django.db.backends.sqlite3'
+        settings.SQLITE_PRAGMAS = {'journal_mode': 'DELETE'}
+        settings.SERIALIZE_WRITES = False
+    if cache:
+        settings.CACHES['default']['LOCATION'] = database + '.cache'
+    else:
+        settings.CACHES = {'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    from yatube.wsgi import application
+    return application
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed_command(options):
+    configure(options.db)
+    from django.core.management import call_command
+    from posts.models import Post
+    from benchmarks.seed import seed
+    call_command('migrate', verbosity=0)
+    if Post.objects.exists():
+        sys.exit(f'В базе {options.db} уже есть записи')
+    counts = seed(
+        users=options.users, groups=options.groups, posts=options.posts,
+        follows=options.follows, comments=options.comments,
+        random_seed=options.seed)
+    print(json.dumps(counts, ensure_ascii=False))
+
+
+def run_command(options):
+    application = configure(options.db, cache=not options.no_cache)
+    from django import get_version
+    from posts.models import Comment, Follow, Group, Post, User
+    from benchmarks.load import VIEWS, run
+    views = options.views or VIEWS
+    report = {
+        'commit': commit(),
+        'started': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': get_version(),
+        'dataset': {
+            'users': User.objects.count(),
+            'groups': Group.objects.count(),
+            'posts': Post.objects.count(),
+            'comments': Comment.objects.count(),
+            'follows': Follow.objects.count(),
+        },
+        'options': {
+            'requests': options.requests,
+            'concurrency': options.concurrency,
+            'warmup': options.warmup,
+            'cache': not options.no_cache,
+            'seed': options.seed,
+        },
+        'views': run(
+            application, views, options.requests, options.concurrency,
+            options.warmup, options.seed),
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+def mixed_command(options):
+    application = configure(options.db, baseline=options.baseline)
+    from benchmarks.load import mixed
+    report = {
+        'commit': commit(),
+        'started': datetime.now(timezone.utc).isoformat(),
+        'options': {
+            'requests': options.requests,
+            'concurrency': options.concurrency,
+            'write_ratio': options.write_ratio,
+            'baseline': options.baseline,
+            'seed': options.seed,
+        },
+        'results': mixed(
+            application, options.requests, options.concurrency,
+            options.write_ratio, options.seed),
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('--db', default=DEFAULT_DB,
+                        help='Файл SQLite для замеров')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Зерно генератора случайных чисел')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help='Заполнить базу данными')
+    seed.add_argument('--users', type=int, default=100)
+    seed.add_argument('--groups', type=int, default=10)
+    seed.add_argument('--posts', type=int, default=20,
+                      help='Записей на пользователя')
+    seed.add_argument('--follows', type=int, default=10,
+                      help='Подписок на пользователя')
+    seed.add_argument('--comments', type=int, default=2,
+                      help='Комментариев на запись в среднем')
+    seed.set_defaults(handler=seed_command)
+
+    load = commands.add_parser('run', help='Замерить страницы')
+    load.add_argument('--requests', type=int, default=200,
+                      help='Запросов к каждой странице')
+    load.add_argument('--concurrency', type=int, default=4,
+                      help='Число одновременных клиентов')
+    load.add_argument('--warmup', type=int, default=20,
+                      help='Запросов для прогрева, не входят в отчёт')
+    load.add_argument('--views', nargs='+',
+                      help='Имена адресов, по умолчанию все ленты')
+    load.add_argument('--no-cache', action='store_true',
+                      help='Отключить кэш страниц')
+    load.add_argument('-o', '--output', help='Файл для отчёта JSON')
+    load.set_defaults(handler=run_command)
+
+    mixed = commands.add_parser(
+        'mixed', help='Замерить одновременные чтения и записи')
+    mixed.add_argument('--requests', type=int, default=1000)
+    mixed.add_argument('--concurrency', type=int, default=8)
+    mixed.add_argument('--write-ratio', type=float, default=0.2,
+                       help='Доля запросов с записью')
+    mixed.add_argument('--baseline', action='store_true',
+                       help='Без профиля SQLite и очереди записи')
+    mixed.add_argument('-o', '--output', help='Файл для отчёта JSON')
+    mixed.set_defaults(handler=mixed_command)
+
+    options = parser.parse_args(argv)
+    options.handler(options)
+
+
+if __name__ == '__main__':
+    main()
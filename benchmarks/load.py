@@ -0,0 +1,222 @@
+import io
+import math
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Group, Post, UserStats
+
+User = get_user_model()
+
+VIEWS = ('index', 'group_posts', 'profile', 'post', 'follow_index')
+READS = ('index', 'group_posts', 'profile', 'post')
+WRITES = ('add_comment', 'new_post')
+SAMPLE_SIZE = 1000
+SESSIONS = 20
+# Любые 64 латинские буквы годятся как токен CSRF, если тот же
+# токен передан в куке и в заголовке.
+CSRF_TOKEN = 'x' * 64
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def _session_cookies(users):
+    cookies = []
+    for user in users:
+        client = Client()
+        client.force_login(user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        cookies.append(f'{settings.SESSION_COOKIE_NAME}={session}')
+    return cookies
+
+
+class Targets:
+    """Адреса страниц для каждого представления на текущих данных."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.slugs = list(Group.objects.order_by('pk').values_list(
+            'slug', flat=True)[:SAMPLE_SIZE])
+        self.authors = list(UserStats.objects.filter(
+            posts_count__gt=0).order_by('pk').values_list(
+            'user__username', flat=True)[:SAMPLE_SIZE])
+        self.posts = list(Post.objects.order_by('pk').values_list(
+            'author__username', 'pk')[:SAMPLE_SIZE])
+        readers = User.objects.filter(
+            stats__following_count__gt=0).order_by('pk')[:SESSIONS]
+        self.cookies = _session_cookies(readers)
+
+    def available(self, view):
+        return bool({
+            'index': True,
+            'group_posts': self.slugs,
+            'profile': self.authors,
+            'post': self.posts,
+            'follow_index': self.cookies,
+        }[view])
+
+    def pick(self, view):
+        """Возвращает (путь, cookie) для очередного запроса."""
+        choice = self.rng.choice
+        if view == 'index':
+            return reverse('index'), None
+        if view == 'group_posts':
+            return reverse('group_posts', args=[choice(self.slugs)]), None
+        if view == 'profile':
+            return reverse('profile', args=[choice(self.authors)]), None
+        if view == 'post':
+            return reverse('post', args=choice(self.posts)), None
+        return reverse('follow_index'), choice(self.cookies)
+
+    def pick_write(self, view, number):
+        """Возвращает (путь, cookie, данные формы) для записи."""
+        cookie = f'{self.rng.choice(self.cookies)}; csrftoken={CSRF_TOKEN}'
+        if view == 'add_comment':
+            path = reverse('add_comment', args=self.rng.choice(self.posts))
+        else:
+            path = reverse('new_post')
+        return path, cookie, {'text': f'Нагрузочная запись {number}'}
+
+
+def call(application, path, cookie=None, data=None):
+    """Выполняет запрос к WSGI-приложению и возвращает код ответа:
+    GET или, если переданы данные формы, POST."""
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path,
+               'HTTP_HOST': 'localhost'}
+    if cookie:
+        environ['HTTP_COOKIE'] = cookie
+    if data is not None:
+        body = urlencode(data).encode()
+        environ.update({
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_X_CSRFTOKEN': CSRF_TOKEN,
+            'wsgi.input': io.BytesIO(body),
+        })
+    setup_testing_defaults(environ)
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(status)
+
+    body = application(environ, start_response)
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return int(statuses[0].split()[0])
+
+
+def _client(application, requests):
+    """Один клиент: запросы подряд, с подсчётом запросов к базе."""
+    executed = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal executed
+        executed += 1
+        return execute(sql, params, many, context)
+
+    results = []
+    with connection.execute_wrapper(count):
+        for path, cookie, *data in requests:
+            before = executed
+            start = time.perf_counter()
+            status = call(application, path, cookie, *data)
+            results.append(
+                (time.perf_counter() - start, executed - before, status))
+    connection.close()
+    return results
+
+
+def _run_clients(application, plan, concurrency):
+    """Раздаёт план запросов клиентам и возвращает результаты
+    и общее время."""
+    chunks = [plan[i::concurrency] for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = [
+            executor.submit(_client, application, chunk) for chunk in chunks]
+        results = [result.result() for result in results]
+    return results, time.perf_counter() - start
+
+
+def _summary(results, elapsed):
+    latencies = [seconds * 1000 for seconds, _, _ in results]
+    return {
+        'requests': len(results),
+        'errors': sum(status >= 400 for _, _, status in results),
+        'requests_per_second': round(len(results) / elapsed, 1),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies), 2),
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+        },
+        'queries_per_request': round(
+            statistics.mean(queries for _, queries, _ in results), 2),
+    }
+
+
+def measure(application, targets, view, requests, concurrency, warmup):
+    plan = [targets.pick(view) for _ in range(warmup + requests)]
+    _client(application, plan[:warmup])
+    chunks, elapsed = _run_clients(application, plan[warmup:], concurrency)
+    return _summary([result for chunk in chunks for result in chunk], elapsed)
+
+
+def mixed(application, requests=1000, concurrency=8, write_ratio=0.2,
+          random_seed=0):
+    """Одновременные чтения лент и записи (комментарии и новые записи).
+    Возвращает общий результат и отдельно по чтениям и записям: запись
+    с кодом 500 обычно означает "database is locked"."""
+    rng = random.Random(random_seed)
+    targets = Targets(rng)
+    plan = []
+    for number in range(requests):
+        if rng.random() < write_ratio:
+            plan.append(targets.pick_write(rng.choice(WRITES), number))
+        else:
+            plan.append(targets.pick(rng.choice(READS)))
+    chunks, elapsed = _run_clients(application, plan, concurrency)
+    reads, writes = [], []
+    for chunk, requests in zip(chunks, (
+            plan[i::concurrency] for i in range(concurrency))):
+        for result, request in zip(chunk, requests):
+            (writes if len(request) == 3 else reads).append(result)
+    return {
+        'total': _summary(reads + writes, elapsed),
+        'reads': _summary(reads, elapsed) if reads else None,
+        'writes': _summary(writes, elapsed) if writes else None,
+    }
+
+
+def run(application, views=VIEWS, requests=200, concurrency=4, warmup=20,
+        random_seed=0):
+    """Нагружает каждое представление по очереди и возвращает
+    результаты по представлениям."""
+    targets = Targets(random.Random(random_seed))
+    report = {}
+    for view in views:
+        if not targets.available(view):
+            report[view] = None
+            continue
+        report[view] = measure(
+            application, targets, view, requests, concurrency, warmup)
+    return report
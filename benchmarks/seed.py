@@ -0,0 +1,93 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.utils import timezone
+
+from posts import search, stats, timeline
+from posts.models import Comment, Follow, Group, Post
+from posts.transfer import original_dates
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+PASSWORD = '1234567'
+WORDS = (
+    'тестовый пост запись группа описание подписка лента автор '
+    'комментарий сообщество новость кот молоко утро вечер город'
+).split()
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed(users=100, groups=10, posts=20, follows=10, comments=2,
+         days=365, random_seed=0):
+    """Заполняет пустую базу синтетическими данными.
+
+    Размер задаётся числом пользователей и средним числом записей,
+    подписок и комментариев на одного пользователя или запись.
+    Одинаковые параметры дают одинаковый набор данных. Пароль всех
+    пользователей — PASSWORD, как в tests/fixtures.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        (User(username=f'TestUser{i}', password=password)
+         for i in range(users)),
+        batch_size=BATCH_SIZE)
+    user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        (Group(title=f'Тестовая группа {i}', slug=f'test-link-{i}',
+               description='Тестовое описание группы')
+         for i in range(groups)),
+        batch_size=BATCH_SIZE)
+    group_ids = list(Group.objects.order_by('pk').values_list('pk', flat=True))
+
+    with original_dates():
+        Post.objects.bulk_create(
+            (Post(author_id=rng.choice(user_ids),
+                  group_id=rng.choice(group_ids + [None]),
+                  text=_text(rng, rng.randint(5, 40)),
+                  pub_date=now - timedelta(seconds=rng.randint(
+                      0, days * 24 * 60 * 60)))
+             for _ in range(users * posts)),
+            batch_size=BATCH_SIZE)
+        post_dates = list(Post.objects.order_by('pk').values_list(
+            'pk', 'pub_date'))
+        Comment.objects.bulk_create(
+            (Comment(post_id=post_id, author_id=rng.choice(user_ids),
+                     text=_text(rng, rng.randint(3, 15)),
+                     created=pub_date + timedelta(minutes=rng.randint(1, 600)))
+             for post_id, pub_date in post_dates
+             for _ in range(rng.randint(0, 2 * comments))),
+            batch_size=BATCH_SIZE)
+
+    # Популярность авторов распределена неравномерно, как в жизни:
+    # на первых пользователей подписываются заметно чаще.
+    weights = [1 / (rank + 1) for rank in range(len(user_ids))]
+    pairs = set()
+    for user_id in user_ids:
+        for author_id in rng.choices(user_ids, weights, k=follows):
+            if author_id != user_id:
+                pairs.add((user_id, author_id))
+    Follow.objects.bulk_create(
+        (Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in sorted(pairs)),
+        batch_size=BATCH_SIZE)
+
+    stats.recount()
+    timeline.rebuild()
+    search.rebuild()
+    cache.clear()
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': len(post_dates),
+        'comments': Comment.objects.count(),
+        'follows': len(pairs),
+    }
@@ -0,0 +1,167 @@
+import hashlib
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_safe
+
+from . import caching, timeline
+from .models import Comment, Group, Post, TimelineEntry, User
+from .pagination import (COMMENTS_ORDERING, COMMENTS_PER_PAGE,
+                         POSTS_ORDERING, POSTS_PER_PAGE, CursorPaginator)
+
+MAX_LIMIT = 100
+
+
+def post_data(post):
+    return {
+        'id': post.pk,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'image': post.image.url if post.image else None,
+        'comments': post.comment_count,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created,
+    }
+
+
+def _response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={
+        'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def _limit(request, default):
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        return default
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def _page(request, object_list, serialize, per_page, ordering):
+    paginator = CursorPaginator(
+        object_list, _limit(request, per_page), ordering)
+    page = paginator.get_page(request.GET.get('after'))
+    return _response({
+        'results': [serialize(obj) for obj in page],
+        'next': page.next_cursor,
+    })
+
+
+def _posts_page(request, posts):
+    return _page(request, posts.feed(), post_data, POSTS_PER_PAGE,
+                 POSTS_ORDERING)
+
+
+def _etag(request, scopes, latest):
+    """Версии областей кэша меняются при любой записи в них, latest —
+    ключ самого свежего объекта, поэтому проверка ETag обходится без
+    построения ответа."""
+    parts = [*caching.versions(*scopes), *(latest or ()),
+             request.GET.urlencode()]
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _latest_post(posts):
+    return posts.order_by(*POSTS_ORDERING).values_list(
+        'pub_date', 'id').first()
+
+
+def index_etag(request):
+    return _etag(request, ['posts'], _latest_post(Post.objects.all()))
+
+
+def group_etag(request, slug):
+    return _etag(request, [f'group:{slug}'],
+                 _latest_post(Post.objects.filter(group__slug=slug)))
+
+
+def profile_etag(request, username):
+    return _etag(request, [f'profile:{username}'],
+                 _latest_post(Post.objects.filter(author__username=username)))
+
+
+def follow_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    latest = TimelineEntry.objects.filter(user=request.user).order_by(
+        *timeline.TIMELINE_ORDERING).values_list('pub_date', 'post_id')
+    return _etag(request, ['posts', f'follow:{request.user.pk}'],
+                 latest.first())
+
+
+def post_etag(request, post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'pub_date', 'author_id', 'group_id').first()
+    if post is None:
+        return None
+    pub_date, author_id, group_id = post
+    return _etag(request, [f'card-post:{post_id}', f'card-author:{author_id}',
+                           f'card-group:{group_id}'], (pub_date, post_id))
+
+
+def comments_etag(request, post_id):
+    latest = Comment.objects.filter(post_id=post_id).order_by(
+        '-created', '-id').values_list('created', 'id').first()
+    return _etag(request, [f'card-post:{post_id}'], latest)
+
+
+@require_safe
+@condition(etag_func=index_etag)
+def index(request):
+    return _posts_page(request, Post.objects.all())
+
+
+@require_safe
+@condition(etag_func=group_etag)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _posts_page(request, group.posts.all())
+
+
+@require_safe
+@condition(etag_func=profile_etag)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return _posts_page(request, author.posts.all())
+
+
+@require_safe
+@condition(etag_func=follow_etag)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return _response({'detail': 'Нужно войти на сайт'}, status=401)
+    page = timeline.home_cursor_page(
+        request.user, request.GET.get('after'),
+        _limit(request, POSTS_PER_PAGE))
+    return _response({
+        'results': [post_data(post) for post in page],
+        'next': page.next_cursor,
+    })
+
+
+@require_safe
+@condition(etag_func=post_etag)
+def post_view(request, post_id):
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    return _response(post_data(post))
+
+
+@require_safe
+@condition(etag_func=comments_etag)
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    return _page(request, comments, comment_data, COMMENTS_PER_PAGE,
+                 COMMENTS_ORDERING)
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from yatube.db import configure_sqlite
+
+        from . import signals  # noqa
+        connection_created.connect(configure_sqlite)
@@ -0,0 +1,143 @@
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_page
+
+from yatube import db
+
+from .models import Group
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def _seed():
+    # Версия, созданная заново после вытеснения, не совпадает ни с одной
+    # из прежних, поэтому старые страницы не оживают.
+    return int(time.time() * 1000)
+
+
+def versions(*scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _seed(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    now = time.time()
+    for scope in set(scopes):
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _seed(), None)
+    cache.set_many(
+        {_modified_key(scope): now for scope in set(scopes)}, None)
+
+
+def _modified_key(scope):
+    return f'modified:{scope}'
+
+
+def modified(*scopes):
+    """Время (в секундах от эпохи) последнего bump каждой области.
+    Если время вытеснено из кэша, область считается изменённой сейчас:
+    вместе с ним могла пропасть и версия."""
+    keys = [_modified_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def post_scopes(post, group_ids=()):
+    group_ids = {post.group_id, *group_ids} - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True)
+    return [
+        'posts',
+        f'card-post:{post.pk}',
+        f'profile:{post.author.username}',
+        *(f'group:{slug}' for slug in slugs),
+    ]
+
+
+def card_scopes(post):
+    return [
+        f'card-post:{post.pk}',
+        f'card-author:{post.author_id}',
+        f'card-group:{post.group_id}',
+    ]
+
+
+def follow_scopes(follow):
+    scopes = [f'follow:{follow.user_id}']
+    for user in (follow.author, follow.user):
+        if user is not None:
+            scopes.append(f'profile:{user.username}')
+    return scopes
+
+
+def profile_scopes(request, username):
+    """Профиль показывает зрителю его рекомендации, поэтому зависит
+    ещё и от них, и от его подписок."""
+    scopes = [f'profile:{username}']
+    if request.user.is_authenticated:
+        scopes += ['suggestions', f'follow:{request.user.pk}']
+    return scopes
+
+
+def revalidate(request, response):
+    """Браузер и прокси могут хранить страницу, но обязаны каждый раз
+    сверять её с сервером: версии областей меняются в любой момент."""
+    if response.has_header('Expires'):
+        del response['Expires']
+    response['Cache-Control'] = (
+        'private, no-cache' if request.user.is_authenticated else 'no-cache')
+    return response
+
+
+def _replica_timeout(view):
+    """Реплика может не успеть получить запись, которая уже сменила
+    версию области, поэтому страница с реплики кэшируется не дольше
+    допустимого отставания."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        reads = db.replica_reads()
+        response = view(request, *args, **kwargs)
+        if db.replica_reads() > reads:
+            patch_cache_control(response, max_age=settings.REPLICA_MAX_LAG)
+        return response
+    return wrapper
+
+
+def cache_feed(get_scopes, timeout=None):
+    """Кэширует страницу ленты под ключом, в который входят версии
+    областей из get_scopes; запись в область сбрасывает кэш сразу."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            scopes = get_scopes(request, *args, **kwargs)
+            prefix = '.'.join(
+                f'{scope}-{version}'
+                for scope, version in zip(scopes, versions(*scopes))
+            )
+            if db.pinned():
+                # Страницы с реплики могут не знать о записи клиента.
+                prefix += '.primary'
+            cached_view = cache_page(
+                timeout or settings.FEED_CACHE_TIMEOUT, key_prefix=prefix
+            )(_replica_timeout(view))
+            return revalidate(request, cached_view(request, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,174 @@
+"""Отрисовка карточки записи и переключателя страниц без шаблонизатора.
+
+render_card и render_paginator выдают байт в байт то же, что шаблоны
+post_item.html и paginator.html, включая пробелы вокруг тегов, и делят
+с шаблоном фрагменты кэша карточек. Поэтому любое изменение шаблона
+нужно повторить здесь: расхождение ловит тест test_cards.
+"""
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template.defaultfilters import linebreaksbr
+from django.urls import reverse
+from django.utils.formats import localize
+from django.utils.html import conditional_escape as escape
+from django.utils.safestring import mark_safe
+from django.utils.timezone import template_localtime
+
+from . import caching, thumbnails
+
+SIZES = '(min-width: 1200px) 960px, 100vw'
+
+
+def version(post):
+    scopes = caching.card_scopes(post)
+    return '.'.join(str(version) for version in caching.versions(*scopes))
+
+
+def variant(post, user):
+    if not user.is_authenticated:
+        return 'guest'
+    return 'author' if user.pk == post.author_id else 'user'
+
+
+def _fragment_cache():
+    # Так же выбирает кэш тег {% cache %}.
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def _picture(post):
+    if not post.image:
+        return ''
+    im = thumbnails.cached(post.image, 'card')
+    if im is None:
+        return ('\n    <div class="card-img bg-light" '
+                'style="padding-top: 35.3%"></div>\n  ')
+    sources = thumbnails.srcset(post.image, 'card')
+    webp = ''
+    if sources['webp']:
+        webp = (f'\n        <source type="image/webp" '
+                f'srcset="{escape(sources["webp"])}" sizes="{SIZES}">\n      ')
+    jpeg = ''
+    if sources['jpeg']:
+        jpeg = f' srcset="{escape(sources["jpeg"])}" sizes="{SIZES}"'
+    return (f'\n    \n    <picture>\n      {webp}\n'
+            f'      <img class="card-img" src="{escape(im.url)}"{jpeg} />\n'
+            f'    </picture>\n  ')
+
+
+def _card(post, user, viewer, pg):
+    author = post.author
+    username = author.username
+    group = ''
+    if not pg and post.group:
+        group = (
+            f'\n      <a class="card-link muted" '
+            f'href="{escape(reverse("group_posts", args=[post.group.slug]))}">'
+            f'\n        <strong class="d-block text-gray-dark">'
+            f'#{escape(post.group.title)}</strong></a>\n    ')
+    comments = ''
+    if post.comment_count:
+        comments = f'\n      Комментариев: {post.comment_count}\n    '
+    edit = ''
+    if viewer == 'author':
+        edit = (
+            f'\n          <a class="btn btn-sm btn-info" '
+            f'href="{escape(reverse("post_edit", args=[username, post.id]))}"'
+            f' role="button">\n            Редактировать\n          </a>\n'
+            f'        ')
+    action = ('Добавить комментарий' if user.is_authenticated
+              else 'Комментарии')
+    pub_date = escape(localize(template_localtime(post.pub_date)))
+    return (
+        f'\n<div class="card mb-3 mt-1 shadow-sm">\n\n  \n  '
+        f'{_picture(post)}\n'
+        f'  <div class="card-body">\n'
+        f'    <p class="card-text">\n'
+        f'      <a name="post_{post.id}" '
+        f'href="{escape(reverse("profile", args=[username]))}">\n'
+        f'        <strong class="d-block text-gray-dark">'
+        f'@{escape(author)}</strong>\n'
+        f'      </a>\n'
+        f'      {linebreaksbr(post.text, autoescape=True)}\n'
+        f'    </p>\n'
+        f'  \n'
+        f'    {group}\n'
+        f'\n'
+        f'    {comments}\n'
+        f'  \n'
+        f'    <div class="d-flex justify-content-between align-items-center">'
+        f'\n'
+        f'      <div class="btn-group">\n'
+        f'\n'
+        f'        <a class="btn btn-sm btn-primary" '
+        f'href="{escape(reverse("post", args=[username, post.id]))}" '
+        f'role="button">\n'
+        f'          {action}\n'
+        f'        </a>\n'
+        f'  \n'
+        f'        {edit}\n'
+        f'      </div>\n'
+        f'  \n'
+        f'      <small class="text-muted">{pub_date}</small>\n'
+        f'    </div>\n'
+        f'  </div>\n'
+        f'</div>\n'
+    )
+
+
+def render_card(post, user, pg=''):
+    """То же, что {% include "post_item.html" %}; pg — как в шаблоне:
+    True на странице сообщества, иначе пустая строка."""
+    viewer = variant(post, user)
+    key = make_template_fragment_key(
+        'post_card', [post.id, version(post), viewer, pg])
+    fragment_cache = _fragment_cache()
+    fragment = fragment_cache.get(key)
+    if fragment is None:
+        fragment = _card(post, user, viewer, pg)
+        fragment_cache.set(key, fragment, None)
+    return mark_safe(f'\n{fragment}\n')
+
+
+def _page_link(number, current):
+    if number == current:
+        return (f'\n          <li class="page-item active"><span '
+                f'class="page-link">{number} <span class="sr-only">'
+                f'(текущая)</span></span></li>\n          ')
+    return (f'\n          <li class="page-item"><a class="page-link" '
+            f'href="?page={number}">{number}</a></li>\n          ')
+
+
+def render_paginator(items, paginator):
+    """То же, что {% include "paginator.html" %}."""
+    disabled = ('<li class="page-item disabled"><a class="page-link" '
+                'href="#" tabindex="-1" aria-disabled="true">')
+    if items.number:
+        if items.has_previous():
+            previous = (f'<li class="page-item"><a class="page-link" '
+                        f'href="?page={items.previous_page_number()}">')
+        else:
+            previous = disabled
+        links = ''.join(
+            f'\n          {_page_link(number, items.number)}\n      '
+            for number in paginator.page_range)
+        pages = (f'\n      \n          {previous}&laquo; Предыдущая</a></li>'
+                 f'\n      \n      {links}\n    ')
+    else:
+        pages = ('\n          <li class="page-item"><a class="page-link" '
+                 'href="?">&laquo; В начало</a></li>\n    ')
+    if items.has_next():
+        following = (f'<li class="page-item"><a class="page-link" '
+                     f'href="?after={escape(items.next_cursor)}">')
+    else:
+        following = disabled
+    return mark_safe(
+        f'<nav aria-label="Переключение страниц">\n'
+        f'    <ul class="pagination">\n'
+        f'    {pages}\n'
+        f'      \n          {following}Следующая &raquo;</a></li>\n      \n'
+        f'    </ul>\n'
+        f'  </nav>'
+    )
@@ -0,0 +1,120 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import caching
+from .models import Comment, Follow, Post, User
+
+
+def conditional_page(get_state):
+    """Отвечает 304 на If-None-Match/If-Modified-Since до запуска
+    представления. get_state(request, *args, **kwargs) дёшево собирает
+    всё, от чего зависит страница: список частей для ETag и время
+    последнего изменения, или возвращает None, если проверить нечего.
+
+    Last-Modified точен до секунды, поэтому страница, изменённая
+    в текущую секунду, отдаётся без него: иначе следующая правка
+    в ту же секунду осталась бы незамеченной для If-Modified-Since.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            state = get_state(request, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            parts, last_modified = state
+            raw = '|'.join(str(part) for part in parts)
+            etag = quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+            timestamp = int(last_modified.timestamp())
+            if timestamp >= int(time.time()):
+                timestamp = None
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+                caching.revalidate(request, response)
+            return response
+        return wrapper
+    return decorator
+
+
+def _viewer(request):
+    """Часть страницы зависит от того, кто её смотрит. Время входа
+    нужно клиентам, которые проверяют только If-Modified-Since:
+    после входа страница должна считаться изменённой."""
+    user = request.user
+    if not user.is_authenticated:
+        return [0], []
+    return [user.pk], [user.last_login] if user.last_login else []
+
+
+def _latest_post(posts):
+    return posts.order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date').first() or (0, None)
+
+
+def _latest_comment(comments):
+    return comments.order_by('-id').values_list(
+        'id', 'created').first() or (0, None)
+
+
+def _state(request, scopes, marks, last_comment, extra=()):
+    """ETag складывается из версий областей (их меняет любая запись,
+    в том числе комментарий), ключей marks и зрителя. Last-Modified —
+    самое позднее из времён marks, last_comment, входа зрителя и смены
+    версий областей: правка и удаление записи не меняют времён marks,
+    а удаление самой новой записи сдвигает их назад."""
+    viewer, viewer_times = _viewer(request)
+    times = [when for _, when in [*marks, last_comment] if when]
+    times += viewer_times
+    times += [datetime.fromtimestamp(seconds, timezone.utc)
+              for seconds in caching.modified(*scopes)]
+    parts = [*caching.versions(*scopes), *(key for key, _ in marks),
+             *viewer, *extra, request.GET.urlencode()]
+    return parts, max(times)
+
+
+def group_state(request, slug):
+    # Последний комментарий на всём сайте — верхняя граница для
+    # Last-Modified, которая не требует соединения с записями группы.
+    return _state(
+        request, [f'group:{slug}'],
+        [_latest_post(Post.objects.filter(group__slug=slug))],
+        _latest_comment(Comment.objects.all()))
+
+
+def profile_state(request, username):
+    author = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author is None:
+        return None
+    following = request.user.is_authenticated and Follow.objects.filter(
+        author_id=author, user=request.user).exists()
+    return _state(
+        request, caching.profile_scopes(request, username),
+        [_latest_post(Post.objects.filter(author_id=author))],
+        _latest_comment(Comment.objects.all()), [following])
+
+
+def post_state(request, username, post_id):
+    post = Post.objects.filter(
+        pk=post_id, author__username=username).order_by().values_list(
+        'pub_date', 'author_id', 'group_id')[:1]
+    if not post:
+        return None
+    pub_date, author_id, group_id = post[0]
+    scopes = [f'card-post:{post_id}', f'card-author:{author_id}',
+              f'card-group:{group_id}']
+    last_comment = _latest_comment(Comment.objects.filter(post_id=post_id))
+    return _state(
+        request, scopes, [(post_id, pub_date), last_comment], last_comment)
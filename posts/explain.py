@@ -0,0 +1,112 @@
+from django.db import connection, transaction
+from django.http import Http404
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from . import urls
+from .models import Follow, Group, Post
+
+# Страницы не должны попадать в общий кэш и браться из него:
+# иначе представление не выполнит ни одного запроса.
+LOCAL_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+def problems(sql, plan):
+    """Полные просмотры таблиц и сортировки во временном B-дереве.
+
+    Просмотр без WHERE либо читает таблицу целиком намеренно, либо
+    идёт в порядке ORDER BY до LIMIT, а ранжирование полнотекстового
+    поиска не может идти по индексу, поэтому такие случаи не считаются
+    проблемой.
+    """
+    subqueries = {
+        detail.split()[-1] for detail in plan
+        if detail.startswith(('CO-ROUTINE ', 'MATERIALIZE '))
+    }
+    reads_all = ' WHERE ' not in sql
+    ranked = any('VIRTUAL TABLE' in detail for detail in plan)
+    found = []
+    for detail in plan:
+        if detail.startswith('USE TEMP B-TREE'):
+            if not ranked:
+                found.append(detail)
+        elif detail.startswith('SCAN ') and not reads_all:
+            words = detail.split()
+            if (' USING ' not in detail and 'VIRTUAL TABLE' not in detail
+                    and words[1] not in subqueries
+                    and words[1] != 'CONSTANT'):
+                found.append(detail)
+    return found
+
+
+def query_plan(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def samples():
+    """Аргументы адресов и пользователь, от имени которого
+    открываются страницы."""
+    post = Post.objects.select_related('author').order_by(
+        '-group', '-pub_date').first()
+    group = Group.objects.order_by('pk').first()
+    follow = Follow.objects.select_related('user').order_by('pk').first()
+    arguments = {}
+    if post is not None:
+        arguments.update(username=post.author.username, post_id=post.pk)
+    if group is not None:
+        arguments['slug'] = group.slug
+    user = follow.user if follow else post.author if post else None
+    query = {}
+    if post is not None and post.text.split():
+        query['post_search'] = {'q': post.text.split()[0]}
+    return arguments, user, query
+
+
+def _select_recorder(queries):
+    def record(execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            queries.append((sql, tuple(params or ())))
+        return execute(sql, params, many, context)
+    return record
+
+
+def explain_view(pattern, arguments, user, query):
+    """Открывает страницу в транзакции, которая затем откатывается,
+    и возвращает планы всех её запросов на чтение."""
+    path = reverse(pattern.name, kwargs={
+        name: arguments[name] for name in pattern.pattern.converters})
+    request = RequestFactory().get(path, query)
+    request.user = user
+    queries = []
+    with override_settings(CACHES=LOCAL_CACHE), transaction.atomic():
+        try:
+            with connection.execute_wrapper(_select_recorder(queries)):
+                pattern.callback(
+                    request, **{name: arguments[name]
+                                for name in pattern.pattern.converters})
+        except Http404:
+            pass
+        plans = []
+        for sql, params in dict.fromkeys(queries):
+            plans.append((sql, query_plan(sql, params)))
+        transaction.set_rollback(True)
+    return plans
+
+
+def explain_views():
+    """Пары (имя адреса, [(sql, план), ...]) для всех страниц
+    posts.urls, которые можно открыть на имеющихся данных."""
+    arguments, user, query = samples()
+    reports = []
+    for pattern in urls.urlpatterns:
+        if user is None or not set(pattern.pattern.converters) <= set(
+                arguments):
+            reports.append((pattern.name, None))
+            continue
+        reports.append((pattern.name, explain_view(
+            pattern, arguments, user, query.get(pattern.name, {}))))
+    return reports
@@ -1,5 +1,7 @@
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm, Textarea
 
+from . import images
 from .models import Comment, Post
 
 
@@ -14,6 +16,20 @@ class PostForm(ModelForm):
             })
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return images.prepare(image)
+        return image
+
+    def store_image(self):
+        """Записывает новое изображение в хранилище. Вызывается до
+        сохранения записи, чтобы хэширование и запись файла не шли
+        внутри транзакции и не держали блокировку базы."""
+        image = self.instance.image
+        if image and not image._committed:
+            image.save(image.name, image.file, save=False)
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps
+
+# Сжатый файл держится в памяти, пока не превысит этот размер.
+SPOOL_SIZE = 1024 * 1024
+
+
+def _has_alpha(image):
+    if image.mode == 'P':
+        return 'transparency' in image.info
+    if image.mode in ('RGBA', 'LA'):
+        return image.getchannel('A').getextrema()[0] < 255
+    return False
+
+
+def prepare(upload):
+    """Уменьшает загруженное изображение до IMAGE_MAX_SIDE по большей
+    стороне, поворачивает по EXIF и сохраняет заново без метаданных:
+    в JPEG, а при прозрачности — в PNG.
+
+    Файл читается с диска, куда его уже записал обработчик загрузки.
+    JPEG сразу декодируется в уменьшенном масштабе (draft), а слишком
+    большие по числу пикселей изображения отклоняются до декодирования,
+    поэтому память ограничена при любом размере загрузки.
+    """
+    if upload.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError('Файл изображения слишком большой')
+    max_side = settings.IMAGE_MAX_SIDE
+    upload.seek(0)
+    image = Image.open(upload)
+    if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError('Изображение слишком большое')
+    if image.format == 'JPEG':
+        image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    if _has_alpha(image):
+        image = image.convert('RGBA')
+        params = {'format': 'PNG', 'optimize': True}
+        extension = 'png'
+    else:
+        image = image.convert('RGB')
+        params = {'format': 'JPEG', 'quality': settings.IMAGE_QUALITY,
+                  'optimize': True, 'progressive': True}
+        extension = 'jpg'
+    output = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+    image.save(output, **params)
+    output.seek(0)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return File(output, name=f'{stem}.{extension}')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = ('Дополняет ленты подписчиков авторов, у которых подписчиков '
+            'снова не больше TIMELINE_FANOUT_LIMIT')
+
+    def handle(self, *args, **options):
+        done = timeline.backfill_pending()
+        self.stdout.write(self.style.SUCCESS(f'Авторов: {done}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации «кого почитать» по графу подписок '
+            'и комментариям')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--per-user', type=int, default=suggestions.PER_USER,
+            help='Сколько авторов рекомендовать каждому пользователю')
+
+    def handle(self, *args, **options):
+        created = suggestions.rebuild(options['per_user'])
+        self.stdout.write(self.style.SUCCESS(f'Рекомендаций: {created}'))
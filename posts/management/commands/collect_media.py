@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+
+class Command(BaseCommand):
+    help = ('Удаляет файлы изображений, на которые не ссылается ни одна '
+            'запись, вместе с их миниатюрами')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int,
+            help='Сколько секунд файл должен пролежать без ссылок')
+
+    def handle(self, *args, **options):
+        removed = media.collect(options['grace'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {removed}'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+
+class Command(BaseCommand):
+    help = ('Переносит загруженные ранее изображения в хранилище по '
+            'содержимому и пересчитывает ссылки на файлы')
+
+    def handle(self, *args, **options):
+        moved = media.migrate()
+        self.stdout.write(self.style.SUCCESS(f'Перенесено файлов: {moved}'))
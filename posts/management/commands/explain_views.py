@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import explain
+
+
+class Command(BaseCommand):
+    help = ('Выводит EXPLAIN QUERY PLAN для запросов всех страниц '
+            'и сообщает о полных просмотрах таблиц и временных сортировках')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite')
+        found = 0
+        for name, plans in explain.explain_views():
+            if plans is None:
+                self.stdout.write(f'{name}: пропущено, не хватает данных')
+                continue
+            self.stdout.write(f'{name}: запросов {len(plans)}')
+            for sql, plan in plans:
+                issues = explain.problems(sql, plan)
+                found += len(issues)
+                if issues or options['verbosity'] > 1:
+                    self.stdout.write(f'  {sql}')
+                    for detail in plan:
+                        line = f'    {detail}'
+                        if detail in issues:
+                            line = self.style.WARNING(line)
+                        self.stdout.write(line)
+        if found:
+            raise CommandError(f'Найдено проблем в планах: {found}')
+        self.stdout.write(self.style.SUCCESS('Проблем не найдено'))
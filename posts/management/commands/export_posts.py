@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает сообщества, пользователей, записи, комментарии '
+            'и подписки в JSONL, не загружая их в память целиком')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-o', '--output', default='-',
+            help='Файл выгрузки, по умолчанию стандартный вывод')
+        parser.add_argument(
+            '--media',
+            help='Каталог, куда копируются изображения по хэшу содержимого')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        stream = (sys.stdout if output == '-'
+                  else open(output, 'w', encoding='utf-8'))
+        try:
+            for line in transfer.export_records(options['media']):
+                stream.write(line + '\n')
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Загружает выгрузку export_posts пачками через bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл JSONL с выгрузкой')
+        parser.add_argument(
+            '--media', help='Каталог с изображениями, названными по хэшу')
+        parser.add_argument(
+            '--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+            help='Размер пачки для bulk_create')
+
+    def handle(self, *args, **options):
+        with open(options['input'], encoding='utf-8') as lines:
+            try:
+                counts = transfer.import_records(
+                    lines, options['media'], options['chunk_size'])
+            except (ValueError, KeyError) as error:
+                raise CommandError(error)
+        for kind, count in counts.items():
+            self.stdout.write(f'{kind}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            'Готово. Миниатюры для новых изображений создаст '
+            'manage.py pregenerate_thumbnails'))
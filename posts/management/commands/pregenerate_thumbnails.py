@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт все миниатюры для уже загруженных изображений записей'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        names = posts.order_by().values_list('image', flat=True).distinct()
+        done = 0
+        for name in names.iterator():
+            thumbnails.generate(name)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано файлов: {done}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики подписчиков, подписок и записей авторов'
+
+    def handle(self, *args, **options):
+        fixed = stats.recount()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено записей: {fixed}'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Фоновый обработчик очереди миниатюр'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать накопившиеся задания и завершиться')
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между опросами пустой очереди, в секундах')
+
+    def handle(self, *args, **options):
+        while True:
+            done = thumbnails.process()
+            close_old_connections()
+            if done:
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
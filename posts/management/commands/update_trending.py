@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Сжимает оценки популярности и пересчитывает списки '
+            'популярных записей и сообществ')
+
+    def handle(self, *args, **options):
+        removed = trending.compact()
+        ranked = trending.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено оценок: {removed}, в списке записей: '
+            f'{len(ranked["posts"])}'))
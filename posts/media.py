@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from . import thumbnails
+from .models import MediaFile, Post
+from .storage import post_images
+
+
+def _images():
+    return Post.objects.exclude(image='').exclude(image__isnull=True)
+
+
+def bump(name, delta):
+    if not name:
+        return
+    now = timezone.now()
+    references = Greatest(F('references') + delta, 0)
+    if MediaFile.objects.filter(name=name).update(
+            references=references, updated=now) or delta < 0:
+        return
+    MediaFile.objects.get_or_create(name=name, defaults={'updated': now})
+    MediaFile.objects.filter(name=name).update(
+        references=references, updated=now)
+
+
+def claim(name):
+    """Обновляет время файла name, не трогая число ссылок, и возвращает
+    True, если строка файла уже была. После этого collect не удалит
+    файл ещё MEDIA_GC_GRACE секунд: удаление строки проверяет время."""
+    now = timezone.now()
+    if MediaFile.objects.filter(name=name).update(updated=now):
+        return True
+    MediaFile.objects.get_or_create(name=name, defaults={'updated': now})
+    return False
+
+
+def replace(previous, name):
+    """Переносит ссылку записи с файлов previous на файл name."""
+    for old in set(previous) - {name}:
+        bump(old, -1)
+    if name not in previous:
+        bump(name, 1)
+
+
+def recount():
+    """Пересчитывает ссылки на файлы по записям и возвращает число
+    исправленных файлов."""
+    real = dict(_images().order_by().values('image').annotate(
+        count=Count('pk')).values_list('image', 'count'))
+    current = dict(MediaFile.objects.values_list('name', 'references'))
+    now = timezone.now()
+    fixed = 0
+    for name in real.keys() | current.keys():
+        count = real.get(name, 0)
+        if current.get(name) == count:
+            continue
+        MediaFile.objects.update_or_create(
+            name=name, defaults={'references': count, 'updated': now})
+        fixed += 1
+    return fixed
+
+
+def collect(grace=None):
+    """Удаляет файлы без ссылок вместе с миниатюрами и возвращает их
+    число. Файл должен пролежать без ссылок grace секунд: так загрузка,
+    которая уже нашла его на диске, успеет сохранить запись."""
+    if grace is None:
+        grace = settings.MEDIA_GC_GRACE
+    unused = MediaFile.objects.filter(
+        references=0, updated__lt=timezone.now() - timedelta(seconds=grace))
+    removed = 0
+    for pk, name in list(unused.values_list('pk', 'name')):
+        if _images().filter(image=name).exists():
+            continue
+        # Условное удаление строки служит захватом файла: если файл
+        # тем временем сохранили заново (claim), время не подойдёт.
+        if not unused.filter(pk=pk).delete()[0]:
+            continue
+        delete_thumbnails(ImageFile(name, post_images))
+        removed += 1
+    return removed
+
+
+def migrate():
+    """Переносит изображения, сохранённые до хранилища по содержимому:
+    копирует каждый файл под имя по хэшу, переключает на него записи
+    и удаляет старый файл с миниатюрами. Возвращает число файлов."""
+    names = _images().order_by().values_list('image', flat=True).distinct()
+    moved = 0
+    for name in list(names):
+        if post_images.is_hashed(name) or not post_images.exists(name):
+            continue
+        with post_images.open(name) as source:
+            new_name = post_images.save(name, source)
+        _images().filter(image=name).update(image=new_name)
+        thumbnails.generate(new_name)
+        delete_thumbnails(ImageFile(name, post_images))
+        moved += 1
+    recount()
+    cache.clear()
+    return moved
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:19
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+import posts.storage
+
+
+def count_references(apps, schema_editor):
+    # Файлы переносит в хранилище по содержимому manage.py dedupe_media,
+    # здесь только заводятся счётчики для уже загруженных изображений.
+    Post = apps.get_model('posts', 'Post')
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    images = (
+        Post.objects.exclude(image='').exclude(image__isnull=True)
+        .order_by().values('image').annotate(count=Count('id'))
+    )
+    now = timezone.now()
+    MediaFile.objects.bulk_create(
+        MediaFile(name=row['image'], references=row['count'], updated=now)
+        for row in images
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_comment_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Файл')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+                ('updated', models.DateTimeField(verbose_name='Изменён')),
+            ],
+            options={
+                'verbose_name': 'Файл изображения',
+                'verbose_name_plural': 'Файлы изображений',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/'),
+        ),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(fields=['references', 'updated'], name='mediafile_unused_idx'),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
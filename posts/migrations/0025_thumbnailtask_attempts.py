@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailtask',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Попыток'),
+        ),
+        migrations.AddField(
+            model_name='thumbnailtask',
+            name='available_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Доступно с'),
+        ),
+    ]
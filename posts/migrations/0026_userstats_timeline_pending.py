@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_thumbnailtask_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='timeline_pending',
+            field=models.BooleanField(default=False, verbose_name='Ленты подписчиков не дополнены'),
+        ),
+    ]
@@ -1,5 +1,10 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from .storage import post_images
 
 
 User = get_user_model()
@@ -15,10 +20,29 @@ class Group(models.Model):
         return self.title
 
     class Meta(object):
+        indexes = [
+            models.Index(fields=["title"], name="group_title_idx"),
+        ]
         verbose_name = 'Группа'
         verbose_name_plural = 'Группы'
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        comment_count = (
+            Comment.objects.filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        return self.select_related('author', 'group').annotate(
+            comment_count=Coalesce(
+                Subquery(comment_count, output_field=models.IntegerField()),
+                0)
+        )
+
+
 class Post(models.Model):
     text = models.TextField('Текст', help_text='Поле для сообщения')
     pub_date = models.DateTimeField("date published", auto_now_add=True)
@@ -28,13 +52,24 @@ class Post(models.Model):
                               blank=True, null=True,
                               related_name="posts", verbose_name='Группа',
                               help_text='Выбор сообщества')
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(upload_to='posts/', storage=post_images,
+                              blank=True, null=True)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.text[:15]} {self.author} {self.pub_date} {self.group}'
 
     class Meta(object):
         ordering = ("-pub_date",)
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"],
+                         name="post_pub_date_idx"),
+            models.Index(fields=["author", "-pub_date", "-id"],
+                         name="post_author_pub_date_idx"),
+            models.Index(fields=["group", "-pub_date", "-id"],
+                         name="post_group_pub_date_idx"),
+        ]
         verbose_name = 'Сообщение'
         verbose_name_plural = 'Сообщения'
 
@@ -50,7 +85,11 @@ class Comment(models.Model):
     created = models.DateTimeField("date published", auto_now_add=True)
 
     class Meta(object):
-        ordering = ("-post",)
+        ordering = ("created",)
+        indexes = [
+            models.Index(fields=["post", "created"],
+                         name="comment_post_created_idx"),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -62,3 +101,158 @@ class Follow(models.Model):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="follower", null=True
         )
+
+    class Meta(object):
+        constraints = [
+            models.UniqueConstraint(fields=["user", "author"],
+                                    name="unique_follow"),
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline"
+        )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+        )
+    pub_date = models.DateTimeField("date published")
+
+    class Meta(object):
+        ordering = ("-pub_date", "-post")
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(fields=["user", "-pub_date", "-post"],
+                         name="timeline_user_pub_date_idx"),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+
+class Suggestion(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="suggestions"
+        )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="suggested_to"
+        )
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Оценка')
+
+    class Meta(object):
+        ordering = ("rank",)
+        unique_together = ("user", "rank")
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации авторов'
+
+
+class TrendingEpoch(models.Model):
+    landmark = models.DateTimeField('Точка отсчёта')
+
+    class Meta(object):
+        verbose_name = 'Точка отсчёта популярности'
+        verbose_name_plural = 'Точки отсчёта популярности'
+
+
+class PostScore(models.Model):
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True,
+        related_name="trending_score"
+        )
+    score = models.FloatField('Оценка', default=0)
+
+    class Meta(object):
+        indexes = [
+            models.Index(fields=["-score"], name="postscore_score_idx"),
+        ]
+        verbose_name = 'Популярность записи'
+        verbose_name_plural = 'Популярность записей'
+
+
+class GroupScore(models.Model):
+    group = models.OneToOneField(
+        Group, on_delete=models.CASCADE, primary_key=True,
+        related_name="trending_score"
+        )
+    score = models.FloatField('Оценка', default=0)
+
+    class Meta(object):
+        indexes = [
+            models.Index(fields=["-score"], name="groupscore_score_idx"),
+        ]
+        verbose_name = 'Популярность сообщества'
+        verbose_name_plural = 'Популярность сообществ'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name="stats"
+        )
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписан', default=0)
+    posts_count = models.PositiveIntegerField('Записей', default=0)
+    timeline_pending = models.BooleanField(
+        'Ленты подписчиков не дополнены', default=False)
+
+    class Meta(object):
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+
+class GroupStats(models.Model):
+    group = models.OneToOneField(
+        Group, on_delete=models.CASCADE, primary_key=True,
+        related_name="stats"
+        )
+    posts_count = models.PositiveIntegerField('Записей', default=0)
+    last_post_at = models.DateTimeField(
+        'Последняя запись', blank=True, null=True)
+
+    class Meta(object):
+        indexes = [
+            models.Index(fields=["-last_post_at", "-group"],
+                         name="groupstats_activity_idx"),
+        ]
+        verbose_name = 'Статистика сообщества'
+        verbose_name_plural = 'Статистика сообществ'
+
+
+class ThumbnailTask(models.Model):
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, related_name="thumbnail_task"
+        )
+    created = models.DateTimeField("date created", auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    available_at = models.DateTimeField(
+        'Доступно с', default=timezone.now)
+
+    class Meta(object):
+        ordering = ("id",)
+        verbose_name = 'Задание на миниатюры'
+        verbose_name_plural = 'Задания на миниатюры'
+
+
+class MediaFile(models.Model):
+    name = models.CharField('Файл', max_length=100, unique=True)
+    references = models.PositiveIntegerField('Ссылок', default=0)
+    updated = models.DateTimeField('Изменён')
+
+    class Meta(object):
+        indexes = [
+            models.Index(fields=["references", "updated"],
+                         name="mediafile_unused_idx"),
+        ]
+        verbose_name = 'Файл изображения'
+        verbose_name_plural = 'Файлы изображений'
+
+
+class Heartbeat(models.Model):
+    """Единственная строка, которую обновляет запись на основной базе.
+    По разнице отметок на основной базе и на реплике видно отставание
+    реплики."""
+    beat = models.DateTimeField('Отметка')
+
+    class Meta(object):
+        verbose_name = 'Отметка репликации'
+        verbose_name_plural = 'Отметки репликации'
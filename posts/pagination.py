@@ -0,0 +1,128 @@
+import base64
+import binascii
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+POSTS_PER_PAGE = 10
+POSTS_ORDERING = ('-pub_date', '-id')
+COMMENTS_PER_PAGE = 20
+COMMENTS_ORDERING = ('created', 'id')
+GROUPS_PER_PAGE = 20
+GROUP_ORDERINGS = {
+    'title': ('-group__title',),
+    'activity': ('-last_post_at', '-group_id'),
+}
+
+
+class CursorPage:
+    number = None
+
+    def __init__(self, object_list, paginator, cursor, next_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return f'<Page after {self.cursor}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу сортировки вместо OFFSET."""
+
+    def __init__(self, object_list, per_page, ordering=POSTS_ORDERING):
+        self.ordering = ordering
+        self.fields = [
+            object_list.model._meta.get_field(name.lstrip('-'))
+            for name in ordering
+        ]
+        self.object_list = object_list.order_by(*ordering)
+        self.per_page = per_page
+
+    def encode(self, obj):
+        raw = '|'.join(field.value_to_string(obj) for field in self.fields)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            parts = raw.split('|')
+            if len(parts) != len(self.fields):
+                return None
+            return [
+                field.to_python(part)
+                for field, part in zip(self.fields, parts)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError,
+                ValidationError):
+            return None
+
+    def keyset(self, values):
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def page(self, cursor=None):
+        values = self.decode(cursor) if cursor else None
+        object_list = self.object_list
+        if values is None:
+            cursor = None
+        else:
+            object_list = object_list.filter(self.keyset(values))
+        items = list(object_list[:self.per_page + 1])
+        next_cursor = None
+        if len(items) > self.per_page:
+            items = items[:self.per_page]
+            next_cursor = self.encode(items[-1])
+        return CursorPage(items, self, cursor, next_cursor)
+
+    get_page = page
+
+
+def paginate(request, object_list, per_page=POSTS_PER_PAGE, count=None,
+             ordering=POSTS_ORDERING):
+    """Ссылки ?page=N работают как раньше, следующие страницы
+    открываются по курсору ?after=<cursor>. Заранее известное
+    число объектов можно передать в count вместо COUNT(*)."""
+    object_list = object_list.order_by(*ordering)
+    after = request.GET.get('after')
+    if after:
+        paginator = CursorPaginator(object_list, per_page, ordering)
+        return {'page': paginator.get_page(after), 'paginator': paginator}
+    paginator = Paginator(object_list, per_page)
+    # Без values() аннотации попали бы в COUNT(*) и потребовали
+    # группировки по каждой записи.
+    paginator.count = (
+        count if count is not None else object_list.values('pk').count())
+    page = paginator.get_page(request.GET.get('page'))
+    page.next_cursor = None
+    if page.has_next():
+        page.next_cursor = CursorPaginator(
+            object_list, per_page, ordering).encode(page[len(page) - 1])
+    return {'page': page, 'paginator': paginator}
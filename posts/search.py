@@ -0,0 +1,124 @@
+import base64
+import binascii
+import re
+
+from django.db import connection
+
+from .models import Post
+from .pagination import POSTS_PER_PAGE, CursorPage, CursorPaginator
+
+TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text, author_id, group_id) '
+            f'VALUES (%s, %s, %s, %s)',
+            [post.pk, post.text, post.author_id, post.group_id])
+
+
+def remove_post(post_id):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild():
+    if not available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text, author_id, group_id) '
+            f'SELECT id, text, author_id, group_id FROM posts_post')
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match_expression(query):
+    """Каждое слово запроса ищется по префиксу отдельной фразой,
+    поэтому пользовательский ввод не может нарушить синтаксис FTS5."""
+    words = WORD.findall(query.lower())
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def encode_cursor(score, post_id):
+    raw = f'{score!r}|{post_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, post_id = base64.urlsafe_b64decode(
+            padded.encode()).decode().split('|')
+        return float(score), int(post_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def _ranked_ids(expression, group_id, author_id, after, limit):
+    sql = [
+        f'SELECT rowid, bm25({TABLE}) FROM {TABLE} WHERE {TABLE} MATCH %s'
+    ]
+    params = [expression]
+    if group_id is not None:
+        sql.append('AND group_id = %s')
+        params.append(group_id)
+    if author_id is not None:
+        sql.append('AND author_id = %s')
+        params.append(author_id)
+    if after is not None:
+        sql.append(
+            f'AND (bm25({TABLE}) > %s '
+            f'OR (bm25({TABLE}) = %s AND rowid > %s))')
+        params.extend([after[0], after[0], after[1]])
+    sql.append(f'ORDER BY bm25({TABLE}), rowid LIMIT %s')
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(' '.join(sql), params)
+        return cursor.fetchall()
+
+
+def search(query, group=None, author=None, cursor=None,
+           per_page=POSTS_PER_PAGE):
+    """Записи, найденные по запросу, в порядке релевантности."""
+    posts = Post.objects.feed()
+    if group is not None:
+        posts = posts.filter(group=group)
+    if author is not None:
+        posts = posts.filter(author=author)
+    if not available():
+        posts = posts.filter(text__icontains=query)
+        return CursorPaginator(posts, per_page).get_page(cursor)
+    expression = match_expression(query)
+    after = decode_cursor(cursor) if cursor else None
+    if expression is None:
+        return CursorPage([], None, None, None)
+    rows = _ranked_ids(
+        expression,
+        group.pk if group is not None else None,
+        author.pk if author is not None else None,
+        after, per_page + 1)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(*reversed(rows[-1]))
+    found = posts.in_bulk([post_id for post_id, score in rows])
+    object_list = [found[post_id] for post_id, score in rows
+                   if post_id in found]
+    return CursorPage(
+        object_list, None, cursor if after else None, next_cursor)
@@ -0,0 +1,140 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import caching, media, search, stats, timeline, trending
+from .models import (Comment, Follow, Group, GroupStats, Post, Suggestion,
+                     User)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    previous = list(
+        Post.objects.filter(pk=instance.pk).values_list('group_id', 'image')
+    ) if instance.pk and not raw else []
+    instance._previous_group_ids = [group for group, image in previous]
+    instance._previous_images = [image for group, image in previous]
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_groups = getattr(instance, '_previous_group_ids', ())
+    if created:
+        stats.bump(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+        trending.post_created(instance)
+    if instance.group_id not in previous_groups:
+        for group_id in previous_groups:
+            stats.group_post_removed(group_id)
+        stats.group_post_added(instance.group_id, instance.pub_date)
+    search.index_post(instance)
+    media.replace(
+        getattr(instance, '_previous_images', ()), instance.image.name)
+    caching.bump(*caching.post_scopes(instance, previous_groups))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, posts_count=-1)
+    stats.group_post_removed(instance.group_id)
+    media.bump(instance.image.name, -1)
+    search.remove_post(instance.pk)
+    caching.bump(*caching.post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump(*caching.post_scopes(instance.post))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    trending.comment_added(instance, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.bump(instance.author_id, followers_count=1)
+        stats.bump(instance.user_id, following_count=1)
+        timeline.backfill(instance)
+        Suggestion.objects.filter(
+            user_id=instance.user_id, author_id=instance.author_id).delete()
+        caching.bump(*caching.follow_scopes(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, followers_count=-1)
+    stats.bump(instance.user_id, following_count=-1)
+    timeline.trim(instance)
+    timeline.author_lightened(instance.author_id)
+    caching.bump(*caching.follow_scopes(instance))
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_card(sender, instance, raw=False, **kwargs):
+    instance._previous_cards = list(
+        Group.objects.filter(pk=instance.pk).values_list('slug', 'title')
+    ) if instance.pk and not raw else []
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        GroupStats.objects.get_or_create(group=instance)
+    if raw:
+        return
+    previous = getattr(instance, '_previous_cards', ())
+    slugs = {instance.slug, *(slug for slug, title in previous)}
+    scopes = [f'card-group:{instance.pk}',
+              *(f'group:{slug}' for slug in slugs)]
+    if any(card != (instance.slug, instance.title) for card in previous):
+        # Название и ссылка группы есть в карточках на общих лентах
+        # и в профилях её авторов.
+        authors = User.objects.filter(posts__group=instance).distinct()
+        scopes += [
+            'posts', 'trending',
+            *(f'profile:{username}' for username in
+              authors.values_list('username', flat=True)),
+        ]
+    caching.bump(*scopes)
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields=None, raw=False,
+                      **kwargs):
+    instance._previous_usernames = list(
+        User.objects.filter(pk=instance.pk).values_list('username', flat=True)
+    ) if (instance.pk and not raw
+          and update_fields != frozenset(['last_login'])) else []
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or update_fields == frozenset(['last_login']):
+        return
+    scopes = [f'card-author:{instance.pk}', f'profile:{instance.username}']
+    renamed = [
+        username for username in getattr(instance, '_previous_usernames', ())
+        if username != instance.username]
+    if renamed:
+        # Имя автора есть в карточках на общих лентах, в лентах его
+        # групп и в рекомендациях.
+        slugs = Group.objects.filter(posts__author=instance).distinct()
+        scopes += [
+            'posts', 'trending', 'suggestions',
+            *(f'profile:{username}' for username in renamed),
+            *(f'group:{slug}' for slug in
+              slugs.values_list('slug', flat=True)),
+        ]
+    caching.bump(*scopes)
@@ -0,0 +1,129 @@
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Follow, Group, GroupStats, Post, User, UserStats
+
+
+def for_user(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def for_group(group):
+    try:
+        return group.stats
+    except GroupStats.DoesNotExist:
+        return GroupStats(group=group)
+
+
+def posts_total():
+    """Число всех записей по счётчикам авторов: строк в UserStats
+    намного меньше, чем записей."""
+    return UserStats.objects.aggregate(
+        total=Coalesce(Sum('posts_count'), 0))['total']
+
+
+def feed_total(user):
+    """Число записей в ленте подписок user по счётчикам авторов."""
+    return Follow.objects.filter(user=user).aggregate(
+        total=Coalesce(Sum('author__stats__posts_count'), 0))['total']
+
+
+def bump(user_id, **deltas):
+    if user_id is None:
+        return
+    updates = {
+        name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()
+    }
+    if UserStats.objects.filter(user_id=user_id).update(**updates):
+        return
+    if min(deltas.values()) < 0:
+        return
+    UserStats.objects.get_or_create(user_id=user_id)
+    UserStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def _last_post(group):
+    return Subquery(
+        Post.objects.filter(group=group).order_by(
+            '-pub_date', '-id').values('pub_date')[:1])
+
+
+def group_post_added(group_id, pub_date):
+    if group_id is None:
+        return
+    GroupStats.objects.get_or_create(group_id=group_id)
+    # В SQLite MAX(NULL, x) — NULL, поэтому пустое поле заменяется на x.
+    GroupStats.objects.filter(group_id=group_id).update(
+        posts_count=F('posts_count') + 1,
+        last_post_at=Greatest(Coalesce('last_post_at', pub_date), pub_date))
+
+
+def group_post_removed(group_id):
+    if group_id is None:
+        return
+    GroupStats.objects.filter(group_id=group_id).update(
+        posts_count=Greatest(F('posts_count') - 1, 0),
+        last_post_at=_last_post(group_id))
+
+
+def _count(queryset, field):
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def recount():
+    """Пересчитывает счётчики и возвращает число исправленных записей."""
+    users = User.objects.annotate(
+        real_followers=_count(Follow.objects.all(), 'author'),
+        real_following=_count(Follow.objects.all(), 'user'),
+        real_posts=_count(Post.objects.all(), 'author'),
+        followers_count=F('stats__followers_count'),
+        following_count=F('stats__following_count'),
+        posts_count=F('stats__posts_count'),
+    ).values_list(
+        'pk', 'real_followers', 'real_following', 'real_posts',
+        'followers_count', 'following_count', 'posts_count',
+    )
+    fixed = 0
+    for pk, followers, following, posts, *current in users.iterator():
+        real = [followers, following, posts]
+        if real == [value or 0 for value in current]:
+            continue
+        UserStats.objects.update_or_create(user_id=pk, defaults={
+            'followers_count': followers,
+            'following_count': following,
+            'posts_count': posts,
+        })
+        fixed += 1
+    return fixed + recount_groups()
+
+
+def recount_groups():
+    groups = Group.objects.annotate(
+        real_posts=_count(Post.objects.all(), 'group'),
+        real_last=_last_post(OuterRef('pk')),
+        posts_count=F('stats__posts_count'),
+        last_post_at=F('stats__last_post_at'),
+        has_stats=F('stats__group'),
+    ).values_list(
+        'pk', 'real_posts', 'real_last', 'posts_count', 'last_post_at',
+        'has_stats')
+    fixed = 0
+    for pk, posts, last, *current, has_stats in groups.iterator():
+        if has_stats is not None and [posts, last] == current:
+            continue
+        GroupStats.objects.update_or_create(group_id=pk, defaults={
+            'posts_count': posts,
+            'last_post_at': last,
+        })
+        fixed += 1
+    return fixed
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_BLOCK = 1024 * 1024
+HASHED_NAME = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}(\.\w+)?$')
+
+
+def file_hash(file):
+    digest = hashlib.sha256()
+    for block in iter(lambda: file.read(HASH_BLOCK), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Сохраняет файл под именем <каталог>/<ab>/<sha256><расширение>,
+    где каталог берётся из upload_to. Одинаковые файлы попадают на диск
+    один раз, и все записи с ними делят одно имя, а значит, и миниатюры.
+
+    Удалять файлы можно только через posts.media.collect: хранилище
+    не знает, сколько записей ссылается на файл, а только отмечает
+    в MediaFile время последнего сохранения.
+    """
+
+    def hashed_name(self, name, digest):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def is_hashed(self, name):
+        return bool(HASHED_NAME.search(name))
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        content.seek(0)
+        name = self.hashed_name(name, file_hash(content))
+        content.seek(0)
+        if self.claim(name) and self.exists(name):
+            return name
+        return self._save(name, content)
+
+    def claim(self, name):
+        """Не даёт posts.media.collect удалить файл, который сейчас
+        переиспользуется. Если строки файла не было, файл мог как раз
+        удаляться, поэтому его нужно записать заново."""
+        # media импортирует модели, а модели — это хранилище.
+        from .media import claim
+        return claim(name)
+
+    def _save(self, name, content):
+        # Файл пишется рядом и переименовывается атомарно: при
+        # одновременной загрузке одинаковых файлов любой из них верен.
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as temp:
+            for chunk in content.chunks():
+                temp.write(chunk)
+        os.chmod(temp.name, self.file_permissions_mode or 0o644)
+        os.replace(temp.name, path)
+        return name
+
+
+post_images = ContentAddressedStorage()
@@ -0,0 +1,172 @@
+import heapq
+from array import array
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Max
+
+from . import caching
+from .models import Comment, Follow, Post, Suggestion, User
+
+PER_USER = 10
+BATCH_SIZE = 500
+CHUNK_SIZE = 10000
+# Сколько соседей вершины просматривается при обходе: популярные
+# авторы и обсуждаемые записи иначе сделали бы обход квадратичным.
+MAX_NEIGHBOURS = 200
+FOLLOW_WEIGHT = 1.0
+COMMENT_WEIGHT = 0.5
+
+
+class Graph:
+    """Разреженная матрица смежности в формате CSR на массивах array:
+    соседи вершины v — targets[offsets[v]:offsets[v + 1]]. Вершины —
+    первичные ключи, поэтому словари для них не нужны, а рёбра занимают
+    по 8 байт."""
+
+    def __init__(self, size, sources, targets):
+        offsets = array('q', [0]) * (size + 1)
+        for source in sources:
+            offsets[source + 1] += 1
+        for vertex in range(size):
+            offsets[vertex + 1] += offsets[vertex]
+        position = array('q', offsets)
+        self.targets = array('q', [0]) * len(targets)
+        for source, target in zip(sources, targets):
+            self.targets[position[source]] = target
+            position[source] += 1
+        self.offsets = offsets
+
+    @classmethod
+    def load(cls, size, pairs):
+        sources, targets = array('q'), array('q')
+        for source, target in pairs.iterator(chunk_size=CHUNK_SIZE):
+            sources.append(source)
+            targets.append(target)
+        return cls(size, sources, targets)
+
+    def degree(self, vertex):
+        return self.offsets[vertex + 1] - self.offsets[vertex]
+
+    def neighbours(self, vertex, limit=None):
+        start = self.offsets[vertex]
+        end = self.offsets[vertex + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.targets[start:end]
+
+
+def _size(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def _scores(user, follows, commented, commenters):
+    """Авторы, на которых подписаны авторы из подписок пользователя,
+    и те, кто комментирует те же записи."""
+    scores = defaultdict(float)
+    for author in follows.neighbours(user, MAX_NEIGHBOURS):
+        for candidate in follows.neighbours(author, MAX_NEIGHBOURS):
+            scores[candidate] += FOLLOW_WEIGHT
+    for post in commented.neighbours(user, MAX_NEIGHBOURS):
+        for candidate in commenters.neighbours(post, MAX_NEIGHBOURS):
+            scores[candidate] += COMMENT_WEIGHT
+    return scores
+
+
+def build(per_user=PER_USER):
+    """Порождает (пользователь, [(оценка, автор), ...]) для всех
+    пользователей. Когда кандидатов мало, список дополняется
+    самыми читаемыми авторами с оценкой 0."""
+    users = _size(User)
+    posts = _size(Post)
+    follows = Graph.load(users, Follow.objects.filter(
+        user__isnull=False, author__isnull=False,
+    ).order_by().values_list('user_id', 'author_id'))
+    pairs = Comment.objects.order_by().values_list(
+        'author_id', 'post_id').distinct()
+    commented = Graph.load(users, pairs)
+    commenters = Graph.load(posts, pairs.values_list('post_id', 'author_id'))
+
+    writers = bytearray(users)
+    for author in Post.objects.order_by().values_list(
+            'author_id', flat=True).distinct().iterator():
+        writers[author] = 1
+    followers = array('q', [0]) * users
+    for author in follows.targets:
+        followers[author] += 1
+    popular = heapq.nlargest(
+        per_user * 2, (author for author in range(users) if writers[author]),
+        key=lambda author: (followers[author], -author))
+
+    # Ключи читаются заранее, чтобы во время записи результатов
+    # не держать открытым курсор.
+    user_ids = array('q', User.objects.order_by('pk').values_list(
+        'pk', flat=True).iterator(chunk_size=CHUNK_SIZE))
+    for user in user_ids:
+        excluded = set(follows.neighbours(user))
+        excluded.add(user)
+        scores = _scores(user, follows, commented, commenters)
+        best = heapq.nlargest(per_user, (
+            (score, -author) for author, score in scores.items()
+            if writers[author] and author not in excluded))
+        chosen = [(score, -negated) for score, negated in best]
+        taken = excluded | {author for _, author in chosen}
+        for author in popular:
+            if len(chosen) >= per_user:
+                break
+            if author not in taken:
+                chosen.append((0.0, author))
+        if chosen:
+            yield user, chosen
+
+
+def _swap(low, high, rows):
+    """Заменяет рекомендации пользователей с ключами в (low, high]
+    (без верхней границы, если high — None) одной короткой
+    транзакцией."""
+    stale = Suggestion.objects.filter(user_id__gt=low)
+    if high is not None:
+        stale = stale.filter(user_id__lte=high)
+    with transaction.atomic():
+        stale.delete()
+        Suggestion.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def rebuild(per_user=PER_USER):
+    """Пересчитывает таблицу рекомендаций и возвращает число строк.
+
+    Всё считается в памяти по графам, загруженным заранее, а в таблицу
+    результат попадает порциями по BATCH_SIZE строк, каждая в своей
+    транзакции: так блокировка записи в базу держится недолго и не
+    мешает сайту. Пока идёт замена, часть пользователей видит старые
+    рекомендации, но у каждого они целиком старые или целиком новые.
+    """
+    created = 0
+    low = 0
+    batch = []
+    for user, chosen in build(per_user):
+        batch.extend(
+            Suggestion(user_id=user, author_id=author, rank=rank,
+                       score=score)
+            for rank, (score, author) in enumerate(chosen))
+        if len(batch) >= BATCH_SIZE:
+            _swap(low, user, batch)
+            created += len(batch)
+            low = user
+            batch = []
+    _swap(low, None, batch)
+    created += len(batch)
+    caching.bump('suggestions')
+    return created
+
+
+def for_user(user, exclude=None):
+    """Рекомендованные авторы одним запросом к таблице Suggestion."""
+    if not user.is_authenticated:
+        return []
+    suggestions = Suggestion.objects.filter(user=user).select_related(
+        'author')
+    return [
+        suggestion.author for suggestion in suggestions
+        if suggestion.author_id != getattr(exclude, 'pk', None)
+    ]
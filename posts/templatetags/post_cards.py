@@ -0,0 +1,55 @@
+from django import template
+from django.conf import settings
+
+from posts import cards, thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def card_version(post):
+    return cards.version(post)
+
+
+@register.filter
+def card_variant(post, user):
+    return cards.variant(post, user)
+
+
+@register.simple_tag
+def ready_thumbnail(post, spec):
+    """Готовая миниатюра или None, пока фоновый обработчик
+    её не создал: тогда карточка показывает заглушку."""
+    if not post.image:
+        return None
+    return thumbnails.cached(post.image, spec)
+
+
+@register.simple_tag
+def card_srcset(post, spec):
+    return thumbnails.srcset(post.image, spec)
+
+
+def _include(context, template_name, **values):
+    template = context.template.engine.get_template(template_name)
+    with context.push(**values):
+        return template.render(context)
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, pg=False):
+    """Карточка записи: при COMPILED_CARDS — из posts.cards,
+    иначе шаблоном post_item.html."""
+    if settings.COMPILED_CARDS:
+        return cards.render_card(post, context['user'], pg or '')
+    if pg:
+        return _include(context, 'post_item.html', post=post, pg=pg)
+    return _include(context, 'post_item.html', post=post)
+
+
+@register.simple_tag(takes_context=True)
+def page_nav(context, page, paginator):
+    if settings.COMPILED_CARDS:
+        return cards.render_paginator(page, paginator)
+    return _include(
+        context, 'paginator.html', items=page, paginator=paginator)
@@ -0,0 +1,84 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+INDEX_URL = reverse('api_index')
+FOLLOW_URL = reverse('api_follow_index')
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', description='Описание', slug='group')
+        cls.guest_client = Client()
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            text='Первая', author=self.author, group=self.group)
+
+    def test_feeds_page_by_cursor(self):
+        """Ленты отдаются в JSON страницами по курсору"""
+        for i in range(12):
+            Post.objects.create(text=f'Запись {i}', author=self.author)
+        first = self.guest_client.get(INDEX_URL, {'limit': 10}).json()
+        second = self.guest_client.get(
+            INDEX_URL, {'limit': 10, 'after': first['next']}).json()
+        self.assertEqual(len(first['results']), 10)
+        self.assertEqual(first['results'][0]['text'], 'Запись 11')
+        self.assertIsNone(second['next'])
+        self.assertEqual(second['results'][-1]['id'], self.post.id)
+        group = self.guest_client.get(
+            reverse('api_group_posts', args=['group'])).json()
+        self.assertEqual(group['results'][0]['group'], 'group')
+        self.assertEqual(len(group['results']), 1)
+        profile = self.guest_client.get(
+            reverse('api_profile', args=['author'])).json()
+        self.assertEqual(len(profile['results']), 10)
+
+    def test_not_modified_until_feed_changes(self):
+        """Повторный запрос с ETag получает 304, пока лента не изменилась"""
+        response = self.guest_client.get(INDEX_URL)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        cached = self.guest_client.get(INDEX_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+        Comment.objects.create(post=self.post, author=self.reader, text='Ок')
+        changed = self.guest_client.get(INDEX_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['results'][0]['comments'], 1)
+
+    def test_post_and_comments(self):
+        """Запись и её комментарии доступны по id записи"""
+        for i in range(3):
+            Comment.objects.create(
+                post=self.post, author=self.reader, text=f'Комментарий {i}')
+        post = self.guest_client.get(
+            reverse('api_post', args=[self.post.id])).json()
+        self.assertEqual(post['author'], 'author')
+        self.assertEqual(post['comments'], 3)
+        url = reverse('api_post_comments', args=[self.post.id])
+        comments = self.guest_client.get(url, {'limit': 2}).json()
+        self.assertEqual(
+            [c['text'] for c in comments['results']],
+            ['Комментарий 0', 'Комментарий 1'])
+        rest = self.guest_client.get(
+            url, {'limit': 2, 'after': comments['next']}).json()
+        self.assertEqual(rest['results'][0]['text'], 'Комментарий 2')
+        missing = self.guest_client.get(
+            reverse('api_post_comments', args=[self.post.id + 100]))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_follow_feed_requires_login(self):
+        """Лента подписок доступна только вошедшему пользователю"""
+        self.assertEqual(self.guest_client.get(FOLLOW_URL).status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        feed = self.reader_client.get(FOLLOW_URL).json()
+        self.assertEqual(feed['results'][0]['id'], self.post.id)
@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from benchmarks import load
+from benchmarks.seed import seed
+from posts.models import Group, Post, TimelineEntry, User, UserStats
+from yatube.wsgi import application
+
+
+class BenchmarkTest(TestCase):
+    def test_seed_is_reproducible(self):
+        """Одинаковые параметры дают одинаковые данные"""
+        counts = seed(users=10, groups=2, posts=3, follows=3)
+        self.assertEqual(counts['posts'], 30)
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)), 30)
+        first = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        seed(users=10, groups=2, posts=3, follows=3)
+        self.assertEqual(self.snapshot(), first)
+
+    def snapshot(self):
+        return list(Post.objects.order_by('pk').values_list(
+            'author__username', 'group__slug', 'text'))
+
+    def test_percentile(self):
+        """Перцентили считаются по ближайшему рангу"""
+        values = list(range(1, 101))
+        self.assertEqual(load.percentile(values, 50), 50)
+        self.assertEqual(load.percentile(values, 99), 99)
+        self.assertEqual(load.percentile([7], 95), 7)
+
+    def test_views_respond_through_wsgi(self):
+        """Все замеряемые страницы открываются через WSGI-приложение"""
+        seed(users=5, groups=1, posts=2, follows=2)
+        cache.clear()
+        targets = load.Targets(load.random.Random(0))
+        for view in load.VIEWS:
+            path, cookie = targets.pick(view)
+            self.assertEqual(load.call(application, path, cookie), 200)
+
+    def test_writes_post_through_wsgi(self):
+        """Записи смешанного замера проходят проверку CSRF"""
+        seed(users=5, groups=1, posts=2, follows=2)
+        targets = load.Targets(load.random.Random(0))
+        for number, view in enumerate(load.WRITES):
+            path, cookie, data = targets.pick_write(view, number)
+            self.assertEqual(load.call(application, path, cookie, data), 302)
+        self.assertTrue(
+            Post.objects.filter(text='Нагрузочная запись 1').exists())
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from yatube.sqlite_cache import SQLiteCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3},
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_add_and_incr_are_shared_between_instances(self):
+        """Счётчики версий видны другому процессу с тем же файлом."""
+        other = SQLiteCache(self.location, {})
+        self.assertTrue(self.cache.add('version', 1, None))
+        self.assertFalse(other.add('version', 5, None))
+        self.assertEqual(other.incr('version'), 2)
+        self.assertEqual(self.cache.get('version'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_entries_are_not_returned(self):
+        """Просроченные записи не возвращаются."""
+        self.cache.set('key', 'value', -1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """При переполнении вытесняются давно не читавшиеся записи."""
+        for key in ('a', 'b', 'c'):
+            self.cache.set(key, key)
+        self.cache.set('d', 'd')
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c', 'd']),
+            {'b': 'b', 'c': 'c', 'd': 'd'})
+
+    def test_size_limit(self):
+        """Общий объём записей не превышает MAX_SIZE."""
+        cache = SQLiteCache(self.location, {'OPTIONS': {'MAX_SIZE': 1000}})
+        for key in range(10):
+            cache.set(str(key), 'x' * 300)
+        self.assertLessEqual(len(cache.get_many(map(str, range(10)))), 3)
+        self.assertEqual(cache.get('9'), 'x' * 300)
@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import cards, thumbnails
+from posts.models import Comment, Group, Post, User
+
+SMALL_PIC = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B')
+
+
+class CompiledCardsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа <b>&', description='Описание', slug='group')
+        for number in range(12):
+            Post.objects.create(
+                text=f'Запись {number}\n<script>&\n\nабзац',
+                author=cls.author,
+                group=cls.group if number % 2 else None)
+        cls.with_image = Post.objects.create(
+            text='С картинкой', author=cls.author, group=cls.group,
+            image=SimpleUploadedFile('small.gif', SMALL_PIC, 'image/gif'))
+        Comment.objects.create(
+            post=cls.with_image, author=cls.reader, text='Ок')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def assertSameCard(self, post, user, pg=''):
+        cache.clear()
+        context = {'post': post, 'user': user}
+        if pg:
+            context['pg'] = pg
+        expected = render_to_string('post_item.html', context)
+        cache.clear()
+        self.assertEqual(cards.render_card(post, user, pg), expected)
+
+    def test_card_matches_template(self):
+        """Карточка из posts.cards совпадает с post_item.html"""
+        posts = list(Post.objects.feed())
+        for user in (AnonymousUser(), self.author, self.reader):
+            for post in posts:
+                for pg in ('', True):
+                    with self.subTest(post=post.pk, user=user, pg=pg):
+                        self.assertSameCard(post, user, pg)
+        thumbnails.enqueue(self.with_image)
+        call_command('thumbnail_worker', once=True)
+        post = Post.objects.feed().get(pk=self.with_image.pk)
+        self.assertSameCard(post, self.reader)
+        self.assertIn('image/webp', cards.render_card(post, self.reader))
+
+    def assertSamePage(self, client, url, data=None):
+        pages = []
+        for compiled in (False, True):
+            cache.clear()
+            with override_settings(COMPILED_CARDS=compiled):
+                response = client.get(url, data)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.content.decode())
+        self.assertEqual(pages[1], pages[0])
+
+    def test_feeds_match_templates(self):
+        """Ленты с COMPILED_CARDS отдают тот же HTML, что и шаблоны"""
+        guest = Client()
+        client = Client()
+        client.force_login(self.author)
+        first = guest.get(reverse('index'))
+        after = first.context['page'].next_cursor
+        cases = [
+            (reverse('index'), None),
+            (reverse('index'), {'page': 2}),
+            (reverse('index'), {'after': after}),
+            (reverse('group_posts', args=['group']), None),
+            (reverse('profile', args=['author']), {'page': 2}),
+        ]
+        for url, data in cases:
+            for visitor in (guest, client):
+                with self.subTest(url=url, data=data):
+                    self.assertSamePage(visitor, url, data)
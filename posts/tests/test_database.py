@@ -0,0 +1,119 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.storage import post_images
+from posts.tests.test_views import CONTENT_TYPE, SMALL_PIC
+from yatube.backends.sqlite3.base import DatabaseWrapper
+from yatube.db import serialized_write
+
+
+class SQLiteProfileTest(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.path = os.path.join(self.directory, 'db.sqlite3')
+        self.database = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': self.path}, alias='profile')
+
+    def tearDown(self):
+        self.database.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def pragma(self, name):
+        with self.database.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connection_gets_pragmas(self):
+        """Новое соединение получает PRAGMA из SQLITE_PRAGMAS"""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(
+            self.pragma('cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+        self.assertEqual(
+            self.pragma('mmap_size'), settings.SQLITE_PRAGMAS['mmap_size'])
+
+    def test_transaction_takes_write_lock_at_begin(self):
+        """Транзакция сразу берёт блокировку записи"""
+        self.database.ensure_connection()
+        self.database._start_transaction_under_autocommit()
+        other = sqlite3.connect(self.path, timeout=0)
+        try:
+            with self.assertRaisesMessage(
+                    sqlite3.OperationalError, 'database is locked'):
+                other.execute('BEGIN IMMEDIATE')
+        finally:
+            other.close()
+            self.database.rollback()
+
+
+@override_settings(WRITE_RETRY_DELAY=0, WRITE_RETRIES=2)
+class SerializedWriteTest(TransactionTestCase):
+    def view(self, errors):
+        calls = []
+
+        @serialized_write
+        def view(request):
+            calls.append(connection.in_atomic_block)
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return HttpResponse('ok')
+        return view, calls
+
+    def test_locked_write_is_retried(self):
+        """Запись, наткнувшаяся на блокировку, повторяется в транзакции"""
+        locked = OperationalError('database is locked')
+        view, calls = self.view([locked, locked])
+        response = view(RequestFactory().post('/'))
+        self.assertEqual(response.content, b'ok')
+        self.assertEqual(calls, [True, True, True])
+
+    def test_retries_are_bounded(self):
+        """После WRITE_RETRIES повторов ошибка передаётся дальше"""
+        locked = OperationalError('database is locked')
+        view, calls = self.view([locked] * 3)
+        with self.assertRaises(OperationalError):
+            view(RequestFactory().post('/'))
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        """Другие ошибки базы не повторяются"""
+        view, calls = self.view([OperationalError('no such table: x')])
+        with self.assertRaises(OperationalError):
+            view(RequestFactory().post('/'))
+        self.assertEqual(len(calls), 1)
+
+    def test_image_is_stored_outside_transaction(self):
+        """Файл изображения пишется до транзакции с записью"""
+        client = Client()
+        client.force_login(User.objects.create(username='author'))
+        upload = SimpleUploadedFile(
+            'small.gif', SMALL_PIC, content_type=CONTENT_TYPE)
+        atomic = []
+        save = post_images.save
+
+        def spy(*args, **kwargs):
+            atomic.append(connection.in_atomic_block)
+            return save(*args, **kwargs)
+
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        try:
+            with override_settings(MEDIA_ROOT=media_root), \
+                    mock.patch.object(post_images, 'save', spy):
+                client.post(reverse('new_post'), {
+                    'text': 'С картинкой', 'image': upload})
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+        self.assertEqual(atomic, [False])
+        self.assertTrue(Post.objects.get(text='С картинкой').image)
@@ -1,13 +1,18 @@
 import shutil
 import tempfile
+from io import BytesIO
+
 from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 from django.test import Client, TestCase
+from django.test import override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.forms import PostForm
-from posts.models import Comment, Follow, Group, Post, User
+from posts.models import (Comment, Follow, Group, Post, ThumbnailTask, User,
+                          UserStats)
 
 SLUG = 'test-slug'
 USER = 'VasyaPupkin'
@@ -84,10 +89,52 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(Post.objects.count(), posts_count + 1)
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group.id, form_data['group'])
-        self.assertEqual(post.image.size, form_data['image'].size)
+        self.assertTrue(post.image.name.endswith('.jpg'))
         self.assertEqual(post.author, self.user)
+        self.assertTrue(ThumbnailTask.objects.filter(post=post).exists())
         self.assertRedirects(response, INDEX_URL)
 
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_create_post_shrinks_image_and_strips_exif(self):
+        """Загруженное изображение уменьшается и теряет EXIF"""
+        exif = Image.Exif()
+        exif[0x0110] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), 'red').save(
+            buffer, format='JPEG', exif=exif)
+        uploaded = SimpleUploadedFile(
+            name='photo.jpeg',
+            content=buffer.getvalue(),
+            content_type='image/jpeg'
+        )
+        self.authorized_client.post(
+            NEW_POST_URL,
+            data={'text': 'Фото', 'image': uploaded},
+            )
+        post = Post.objects.get(text='Фото')
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertEqual(len(image.getexif()), 0)
+        self.assertTrue(post.image.name.endswith('.jpg'))
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_huge_image_rejected(self):
+        """Изображение со слишком большим числом пикселей отклоняется"""
+        buffer = BytesIO()
+        Image.new('RGB', (20, 20)).save(buffer, format='PNG')
+        uploaded = SimpleUploadedFile(
+            name='huge.png',
+            content=buffer.getvalue(),
+            content_type='image/png'
+        )
+        response = self.authorized_client.post(
+            NEW_POST_URL,
+            data={'text': 'Огромное', 'image': uploaded},
+            )
+        self.assertFormError(
+            response, 'form', 'image', 'Изображение слишком большое')
+        self.assertFalse(Post.objects.filter(text='Огромное').exists())
+
     def test_create_comment(self):
         """Валидная форма создает комментарий."""
         comments_count = Comment.objects.count()
@@ -130,7 +177,7 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(Post.objects.count(), posts_count)
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group.id, form_data['group'])
-        self.assertEqual(post.image.size, form_data['image'].size)
+        self.assertTrue(post.image.name.endswith('.jpg'))
         self.assertRedirects(response, self.VIEW_POST_URL)
 
     def test_new_post_pages_show_correct_context(self):
@@ -155,6 +202,10 @@ class PostCreateFormTests(TestCase):
         follow = Follow.objects.get(user=self.user, author=self.user2)
         self.assertEqual(count+1, Follow.objects.count())
         self.assertEqual(follow.author, self.user2)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user2).followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).following_count, 1)
 
     def test_authorized_client_can_unsubscribe_to_other_users(self):
         """Авторизованный пользователь может отписываться
@@ -164,3 +215,5 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(count+1, Follow.objects.count())
         self.authorized_client.post(self.UNFOLLOW_URL)
         self.assertFalse(Follow.objects.exists())
+        self.assertEqual(
+            UserStats.objects.get(user=self.user2).followers_count, 0)
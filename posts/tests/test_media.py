@@ -0,0 +1,122 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import media
+from posts.models import MediaFile, Post, User
+from posts.storage import post_images
+
+SMALL_PIC = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B')
+
+
+def upload():
+    return SimpleUploadedFile('small.gif', SMALL_PIC, 'image/gif')
+
+
+class MediaStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.user = User.objects.create(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def references(self, name):
+        return MediaFile.objects.get(name=name).references
+
+    def test_same_image_stored_once(self):
+        """Одинаковые изображения хранятся одним файлом со счётчиком"""
+        first = Post.objects.create(
+            text='Первая', author=self.user, image=upload())
+        second = Post.objects.create(
+            text='Вторая', author=self.user, image=upload())
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(post_images.is_hashed(name))
+        self.assertTrue(name.startswith('posts/'))
+        self.assertEqual(self.references(name), 2)
+        first.delete()
+        self.assertEqual(self.references(name), 1)
+        self.assertEqual(media.collect(grace=0), 0)
+        second.delete()
+        self.assertEqual(media.collect(grace=0), 1)
+        self.assertFalse(post_images.exists(name))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+
+    def test_replaced_image_released(self):
+        """Замена изображения снимает ссылку со старого файла"""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=upload())
+        old = post.image.name
+        post.image = ContentFile(b'GIF89a' + SMALL_PIC[6:] + b'\0',
+                                 name='other.gif')
+        post.save()
+        self.assertNotEqual(post.image.name, old)
+        self.assertEqual(self.references(old), 0)
+        self.assertEqual(self.references(post.image.name), 1)
+        self.assertEqual(media.collect(grace=60), 0)
+        self.assertEqual(media.collect(grace=0), 1)
+
+    def test_reused_file_is_not_collected(self):
+        """Повторно сохранённый файл без ссылок не удаляется сборкой"""
+        old = Post.objects.create(
+            text='Старая', author=self.user, image=upload())
+        name = old.image.name
+        old.delete()
+        MediaFile.objects.filter(name=name).update(
+            updated=timezone.now() - timedelta(hours=1))
+        self.assertEqual(post_images.save('posts/small.gif', upload()), name)
+        self.assertEqual(media.collect(grace=60), 0)
+        self.assertTrue(post_images.exists(name))
+        Post.objects.create(text='Новая', author=self.user, image=name)
+        self.assertEqual(self.references(name), 1)
+
+    def test_file_being_collected_is_written_again(self):
+        """Файл, строку которого уже удалила сборка, записывается заново"""
+        name = post_images.save('posts/small.gif', upload())
+        MediaFile.objects.filter(name=name).delete()
+        with mock.patch.object(
+                post_images, '_save', wraps=post_images._save) as write:
+            self.assertEqual(
+                post_images.save('posts/small.gif', upload()), name)
+        write.assert_called_once()
+        self.assertEqual(self.references(name), 0)
+
+    def test_dedupe_media_moves_old_files(self):
+        """dedupe_media переносит старые файлы под имена по хэшу"""
+        legacy = FileSystemStorage(location=post_images.location)
+        names = [legacy.save('posts/small.gif', ContentFile(SMALL_PIC))
+                 for _ in range(2)]
+        for name in names:
+            Post.objects.create(text=name, author=self.user, image=name)
+        self.assertNotEqual(names[0], names[1])
+
+        call_command('dedupe_media', stdout=StringIO())
+
+        hashed = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(hashed), 1)
+        name = hashed.pop()
+        self.assertTrue(post_images.is_hashed(name))
+        self.assertEqual(self.references(name), 2)
+        self.assertFalse(any(legacy.exists(old) for old in names))
+        self.assertEqual(Post.objects.first().image.read(), SMALL_PIC)
@@ -0,0 +1,46 @@
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+
+
+class ServerTimingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.client = Client()
+
+    def setUp(self):
+        Post.objects.create(text='Текст', author=self.user)
+
+    def test_header_and_log_line(self):
+        """Ответ содержит Server-Timing, а журнал — строку JSON
+           с именем адреса и теми же счётчиками"""
+        with self.assertLogs('yatube.requests', 'INFO') as logs:
+            response = self.client.get(
+                reverse('profile', args=[self.user.username]))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'profile')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['db_queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{record["db_queries"]} queries"', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_cache_hits_and_misses_counted(self):
+        """Повторный запрос страницы берётся из кэша без запросов к базе"""
+        cache.clear()
+        url = reverse('index')
+        with self.assertLogs('yatube.requests', 'INFO') as logs:
+            self.client.get(url)
+            self.client.get(url)
+        first, second = (json.loads(r.getMessage()) for r in logs.records)
+        self.assertGreater(first['cache_misses'], 0)
+        self.assertEqual(second['cache_misses'], 0)
+        self.assertGreater(second['cache_hits'], 0)
+        self.assertEqual(second['db_queries'], 0)
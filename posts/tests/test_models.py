@@ -1,6 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from posts.models import Group, Post, User
+from posts.models import Group, GroupStats, Post, User, UserStats
 
 
 class PostModelTest(TestCase):
@@ -46,6 +49,65 @@ class PostModelTest(TestCase):
                     post._meta.get_field(value).help_text, expected)
 
 
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='counter')
+
+    def test_post_counter_follows_create_and_delete(self):
+        """Счётчик записей меняется при создании и удалении записи."""
+        post = Post.objects.create(text='Текст', author=self.user)
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 1)
+        post.delete()
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 0)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount_stats исправляет расхождение счётчиков."""
+        Post.objects.bulk_create(
+            Post(text=f'Текст {i}', author=self.user) for i in range(3))
+        call_command('recount_stats', stdout=StringIO())
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 3)
+
+
+class GroupStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='counter')
+        cls.group = Group.objects.create(title='Первая', slug='first')
+        cls.other = Group.objects.create(title='Вторая', slug='second')
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def test_group_counters_follow_posts(self):
+        """Счётчик и время последней записи сообщества меняются при
+        создании, переносе и удалении записи."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, group=self.group)
+        self.assertEqual(self.stats(self.group).posts_count, 1)
+        self.assertEqual(self.stats(self.group).last_post_at, post.pub_date)
+        post.group = self.other
+        post.save()
+        self.assertEqual(self.stats(self.group).posts_count, 0)
+        self.assertIsNone(self.stats(self.group).last_post_at)
+        self.assertEqual(self.stats(self.other).posts_count, 1)
+        post.delete()
+        self.assertEqual(self.stats(self.other).posts_count, 0)
+        self.assertIsNone(self.stats(self.other).last_post_at)
+
+    def test_recount_repairs_group_drift(self):
+        """Команда recount_stats исправляет счётчики сообществ."""
+        Post.objects.bulk_create(
+            Post(text=f'Текст {i}', author=self.user, group=self.group)
+            for i in range(3))
+        call_command('recount_stats', stdout=StringIO())
+        stats = self.stats(self.group)
+        self.assertEqual(stats.posts_count, 3)
+        self.assertIsNotNone(stats.last_post_at)
+
+
 class GroupModelTest(TestCase):
     @classmethod
     def setUpClass(cls):
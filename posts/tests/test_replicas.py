@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Heartbeat, Post, User
+from yatube import db
+from yatube.middleware import PIN_COOKIE
+
+INDEX_URL = reverse('index')
+NEW_POST_URL = reverse('new_post')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_CHECK_INTERVAL=0)
+class ReplicaRouterTest(TransactionTestCase):
+    # Без обёртки TestCase в транзакцию: роутер отличает чтения
+    # внутри транзакции.
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        # Реплику заменяет второй файл SQLite, данные в него
+        # записываются напрямую, как их доставила бы репликация.
+        cls.replica_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        }
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            call_command('migrate', database='replica', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='writer')
+        User.objects.using('replica').create(
+            pk=self.user.pk, username='writer')
+        self.beat(timezone.now())
+        db.reset()
+
+    def beat(self, primary, replica=None):
+        Heartbeat.objects.using('default').update_or_create(
+            pk=1, defaults={'beat': primary})
+        Heartbeat.objects.using('replica').update_or_create(
+            pk=1, defaults={'beat': replica or primary})
+
+    def test_reads_go_to_fresh_replica(self):
+        """Чтения идут на реплику, которая не отстаёт"""
+        User.objects.using('replica').create(username='replicated')
+        self.assertTrue(User.objects.filter(username='replicated').exists())
+        self.assertEqual(User.objects.get(username='writer').pk, self.user.pk)
+
+    def test_lagging_replica_is_skipped(self):
+        """Реплика, отставшая больше REPLICA_MAX_LAG, не используется"""
+        now = timezone.now()
+        self.beat(now, now - timedelta(seconds=settings.REPLICA_MAX_LAG + 1))
+        User.objects.using('replica').create(username='replicated')
+        self.assertFalse(User.objects.filter(username='replicated').exists())
+
+    def test_replica_without_heartbeat_is_skipped(self):
+        """Реплика, не получившая ни одной отметки, не используется"""
+        Heartbeat.objects.using('replica').all().delete()
+        User.objects.using('replica').create(username='replicated')
+        self.assertFalse(User.objects.filter(username='replicated').exists())
+
+    def test_write_pins_thread_to_primary(self):
+        """После записи чтения идут в основную базу"""
+        Post.objects.create(text='Своя запись', author=self.user)
+        self.assertTrue(Post.objects.filter(text='Своя запись').exists())
+
+    def test_writer_reads_own_writes(self):
+        """Автор сразу видит свою запись, остальные читают реплику"""
+        client = Client()
+        client.force_login(self.user)
+        response = client.post(NEW_POST_URL, {'text': 'Своя запись'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertTrue(Heartbeat.objects.using('default').exists())
+        self.assertNotContains(Client().get(INDEX_URL), 'Своя запись')
+        self.assertContains(client.get(INDEX_URL), 'Своя запись')
+
+    def test_pin_expires(self):
+        """Без куки клиент снова читает реплику"""
+        client = Client()
+        client.force_login(self.user)
+        client.post(NEW_POST_URL, {'text': 'Своя запись'})
+        del client.cookies[PIN_COOKIE]
+        cache.clear()
+        self.assertNotContains(client.get(INDEX_URL), 'Своя запись')
+
+    def test_reads_in_write_transaction_use_primary(self):
+        """Проверка перед записью читает основную базу, а не реплику,
+           которая ещё не получила подписку"""
+        author = User.objects.create(username='author')
+        User.objects.using('replica').create(pk=author.pk, username='author')
+        Follow.objects.create(user=self.user, author=author)
+        db.reset()
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('profile_follow', args=['author']))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Follow.objects.using('default').count(), 1)
+
+    def test_post_requests_read_primary(self):
+        """Запрос POST проверяет запись по основной базе"""
+        post = Post.objects.create(text='Не на реплике', author=self.user)
+        db.reset()
+        client = Client()
+        client.force_login(self.user)
+        client.post(
+            reverse('add_comment', args=['writer', post.pk]), {'text': 'Ок'})
+        self.assertTrue(Comment.objects.using('default').filter(
+            post=post, text='Ок').exists())
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class NoReplicaTest(TestCase):
+    def test_writes_do_not_pin_without_replicas(self):
+        """Без реплик запись не делит кэш страниц на основной и общий"""
+        db.reset(pinned=True)
+        Client().get(INDEX_URL)
+        self.assertFalse(db.pinned())
+        User.objects.create(username='writer')
+        self.assertFalse(db.pinned())
@@ -0,0 +1,95 @@
+from array import array
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import suggestions
+from posts.models import Comment, Follow, Post, Suggestion, User
+from posts.suggestions import Graph
+
+FOLLOW_INDEX_URL = reverse('follow_index')
+
+
+class SuggestionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        names = ['reader', 'friend', 'writer', 'commenter', 'star', 'silent']
+        cls.users = {
+            name: User.objects.create(username=name) for name in names}
+        for name in ('friend', 'writer', 'commenter', 'star'):
+            Post.objects.create(text=name, author=cls.users[name])
+        follows = [('reader', 'friend'), ('friend', 'writer'),
+                   ('friend', 'silent'), ('writer', 'star'),
+                   ('commenter', 'star'), ('silent', 'star')]
+        for user, author in follows:
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author])
+        post = Post.objects.get(author=cls.users['star'])
+        for name in ('reader', 'commenter'):
+            Comment.objects.create(
+                post=post, author=cls.users[name], text='Ок')
+
+    def setUp(self):
+        cache.clear()
+
+    def suggested(self, name):
+        return list(Suggestion.objects.filter(
+            user=self.users[name]).values_list('author__username', flat=True))
+
+    def test_graph_neighbours(self):
+        """CSR-граф отдаёт соседей вершины и ограничивает их число"""
+        graph = Graph(4, array('q', [2, 0, 2, 2]), array('q', [1, 3, 0, 3]))
+        self.assertEqual(list(graph.neighbours(0)), [3])
+        self.assertEqual(list(graph.neighbours(1)), [])
+        self.assertEqual(sorted(graph.neighbours(2)), [0, 1, 3])
+        self.assertEqual(len(graph.neighbours(2, limit=2)), 2)
+        self.assertEqual(graph.degree(2), 3)
+
+    def test_suggestions_ranked_by_follows_and_comments(self):
+        """Рекомендации учитывают подписки подписок и общие комментарии,
+           не включают себя, подписки и авторов без записей"""
+        call_command('build_suggestions', per_user=3, stdout=StringIO())
+        suggested = self.suggested('reader')
+        self.assertEqual(suggested, ['writer', 'commenter', 'star'])
+        self.assertNotIn('friend', suggested)
+        self.assertNotIn('reader', suggested)
+        self.assertNotIn('silent', suggested)
+        # Без связей в графе остаются самые читаемые авторы.
+        self.assertEqual(
+            self.suggested('silent'), ['friend', 'writer', 'commenter'])
+
+    def test_rebuild_swaps_rows_in_short_transactions(self):
+        """Пересчёт заменяет строки порциями и убирает устаревшие"""
+        for name in ('reader', 'silent'):
+            Suggestion.objects.create(
+                user=self.users[name], author=self.users['star'],
+                rank=5, score=9)
+        with mock.patch.object(suggestions, 'BATCH_SIZE', 3), \
+                mock.patch.object(suggestions, '_swap',
+                                  wraps=suggestions._swap) as swap:
+            created = suggestions.rebuild(per_user=3)
+        self.assertGreater(swap.call_count, 2)
+        self.assertEqual(Suggestion.objects.count(), created)
+        self.assertFalse(Suggestion.objects.filter(rank=5).exists())
+        self.assertEqual(self.suggested('reader'),
+                         ['writer', 'commenter', 'star'])
+
+    def test_follow_index_shows_suggestions(self):
+        """Лента подписок показывает рекомендации, подписка убирает автора"""
+        call_command('build_suggestions', stdout=StringIO())
+        client = Client()
+        client.force_login(self.users['reader'])
+        response = client.get(FOLLOW_INDEX_URL)
+        self.assertEqual(response.context['suggestions'][0],
+                         self.users['writer'])
+        self.assertContains(response, 'Кого почитать')
+        client.get(reverse('profile_follow', args=['writer']))
+        response = client.get(FOLLOW_INDEX_URL)
+        self.assertNotIn(self.users['writer'], response.context['suggestions'])
+        response = client.get(reverse('profile', args=['commenter']))
+        self.assertNotIn(
+            self.users['commenter'], response.context['suggestions'])
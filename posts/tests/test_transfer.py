@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+SMALL_PIC = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B')
+
+
+class TransferCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.directory = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_export_import_round_trip(self):
+        """Выгрузка и загрузка сохраняют записи, связи и даты."""
+        author = User.objects.create(username='author')
+        reader = User.objects.create(username='reader')
+        group = Group.objects.create(
+            title='Группа', description='Описание', slug='group')
+        post = Post.objects.create(
+            text='Текст', author=author, group=group,
+            image=SimpleUploadedFile('small.gif', SMALL_PIC, 'image/gif'))
+        Comment.objects.create(post=post, author=reader, text='Ок')
+        Follow.objects.create(user=reader, author=author)
+        dump = os.path.join(self.directory, 'dump.jsonl')
+        media = os.path.join(self.directory, 'media')
+        call_command('export_posts', output=dump, media=media)
+        pub_date = post.pub_date
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+        call_command('import_posts', dump, media=media, stdout=StringIO())
+
+        post = Post.objects.get()
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(post.image.read(), SMALL_PIC)
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        self.assertTrue(Follow.objects.filter(
+            user__username='reader', author__username='author'))
+        self.assertEqual(
+            UserStats.objects.get(user__username='author').followers_count, 1)
+
+    def test_repeated_import_adds_nothing(self):
+        """Повторная загрузка той же выгрузки не создаёт дублей."""
+        author = User.objects.create(username='author')
+        reader = User.objects.create(username='reader')
+        post = Post.objects.create(text='Текст', author=author)
+        Comment.objects.create(post=post, author=reader, text='Ок')
+        Comment.objects.create(post=post, author=author, text='Спасибо')
+        Follow.objects.create(user=reader, author=author)
+        dump = os.path.join(self.directory, 'repeat.jsonl')
+        call_command('export_posts', output=dump)
+
+        call_command('import_posts', dump, stdout=StringIO())
+
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import trending
+from posts.models import Comment, Group, GroupScore, Post, PostScore, User
+
+TRENDING_URL = reverse('trending')
+
+
+class TrendingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='author')
+        self.group = Group.objects.create(
+            title='Группа', description='Описание', slug='group')
+        self.quiet = Post.objects.create(text='Тихая', author=self.user)
+        self.hot = Post.objects.create(
+            text='Обсуждаемая', author=self.user, group=self.group)
+        self.newest = Post.objects.create(text='Новая', author=self.user)
+        self.comments = [
+            Comment.objects.create(post=self.hot, author=self.user, text='Ок')
+            for _ in range(2)]
+
+    def score(self, post):
+        return PostScore.objects.get(post=post).score
+
+    def test_trending_page_ranks_by_activity(self):
+        """Популярное упорядочено по записям и комментариям"""
+        response = Client().get(TRENDING_URL)
+        self.assertEqual(
+            list(response.context['page']),
+            [self.hot, self.newest, self.quiet])
+        self.assertEqual(response.context['groups'], [self.group])
+        self.assertContains(response, 'Популярные сообщества')
+
+    def test_older_events_weigh_less(self):
+        """Вклад события убывает вдвое за TRENDING_HALF_LIFE"""
+        now = trending.landmark()
+        half_life = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        self.assertAlmostEqual(
+            trending.weight(1, now) / trending.weight(1, now - half_life), 2)
+
+    def test_deleted_comment_removes_its_weight(self):
+        """Удалённый комментарий больше не влияет на оценку"""
+        before = self.score(self.hot)
+        self.comments[0].delete()
+        self.assertAlmostEqual(
+            self.score(self.hot), before - trending.weight(
+                trending.COMMENT_WEIGHT, self.comments[0].created))
+
+    def test_compaction_keeps_order_and_drops_faded(self):
+        """Сжатие сохраняет порядок и удаляет угасшие оценки"""
+        landmark = trending.landmark()
+        hot, quiet = self.score(self.hot), self.score(self.quiet)
+        half_life = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        trending.compact(landmark + half_life)
+        self.assertAlmostEqual(self.score(self.hot), hot / 2)
+        self.assertAlmostEqual(self.score(self.quiet), quiet / 2)
+        Comment.objects.create(post=self.quiet, author=self.user, text='Ок')
+        call_command('update_trending', stdout=StringIO())
+        self.assertEqual(trending.ranked()['posts'][0], self.hot.pk)
+        trending.compact(trending.landmark() + 10 * half_life)
+        self.assertFalse(PostScore.objects.exists())
+        self.assertFalse(GroupScore.objects.exists())
@@ -1,12 +1,23 @@
 import shutil
 import tempfile
+import time
+from contextlib import ExitStack
+from io import StringIO
+from unittest import mock
+
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from posts.models import Follow, Group, Post, User
+from posts import caching, thumbnails
+from posts.models import (Comment, Follow, Group, Post, ThumbnailTask,
+                          TimelineEntry, User, UserStats)
 
 USER = 'VasyaPupkin'
 USER2 = 'PupaVaskin'
@@ -18,6 +29,8 @@ INDEX_URL = reverse('index')
 NEW_POST_URL = reverse('new_post')
 USER_URL = reverse('profile', args=[USER])
 FOLLOW_INDEX_URL = reverse('follow_index')
+SEARCH_URL = reverse('post_search')
+GROUPS_URL = reverse('allgroups')
 
 CONTENT_TYPE = 'image/gif'
 SMALL_PIC = (
@@ -102,6 +115,354 @@ class PostViewTest(TestCase):
         post = response.context.get('page')
         self.assertNotIn(self.post, post)
 
+    def test_unfollow_trims_timeline(self):
+        """После отписки записи автора удаляются из ленты подписок"""
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=self.post2))
+        self.follow.delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+        response = self.authorized_client.get(FOLLOW_INDEX_URL)
+        self.assertNotIn(self.post2, response.context.get('page'))
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_heavy_author_posts_merged_on_read(self):
+        """Записи популярного автора не раскладываются по лентам,
+           но появляются на странице подписок"""
+        post = Post.objects.create(text='Популярный', author=self.user2)
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        response = self.authorized_client.get(FOLLOW_INDEX_URL)
+        self.assertEqual(response.context.get('page')[0], post)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_below_limit_keeps_posts_in_feeds(self):
+        """Когда у автора становится меньше подписчиков, его записи,
+           написанные в популярности, остаются в лентах, а фоновая
+           команда раскладывает их по лентам"""
+        reader = User.objects.create(username='reader')
+        Follow.objects.create(user=reader, author=self.user2)
+        post = Post.objects.create(text='Популярный', author=self.user2)
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        Follow.objects.get(user=reader).delete()
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        response = self.authorized_client.get(FOLLOW_INDEX_URL)
+        self.assertIn(post, response.context.get('page'))
+        call_command('backfill_timelines', stdout=StringIO())
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post))
+        self.assertFalse(UserStats.objects.get(
+            user=self.user2).timeline_pending)
+        cache.clear()
+        response = self.authorized_client.get(FOLLOW_INDEX_URL)
+        self.assertIn(post, response.context.get('page'))
+
+    def test_cursor_pagination_continues_page_numbers(self):
+        """Курсор следующей страницы продолжает постраничный вывод"""
+        for i in range(15):
+            Post.objects.create(text=f'Запись {i}', author=self.user)
+        first = self.guest_client.get(USER_URL).context['page']
+        second = self.guest_client.get(
+            USER_URL, {'after': first.next_cursor}).context['page']
+        numbered = self.guest_client.get(
+            USER_URL, {'page': 2}).context['page']
+        self.assertEqual(len(second), 6)
+        self.assertFalse(second.has_next())
+        self.assertEqual(list(second), list(numbered))
+        self.assertTrue(set(first).isdisjoint(second))
+
+    def test_follow_index_pages_by_timeline_cursor(self):
+        """Лента подписок листается по курсору без пропусков"""
+        for i in range(15):
+            Post.objects.create(text=f'Запись {i}', author=self.user2)
+        first = self.authorized_client.get(FOLLOW_INDEX_URL).context['page']
+        second = self.authorized_client.get(
+            FOLLOW_INDEX_URL, {'after': first.next_cursor}).context['page']
+        self.assertEqual(len(first) + len(second), 16)
+        self.assertEqual(second[len(second) - 1], self.post2)
+        self.assertTrue(set(first).isdisjoint(second))
+
+    def test_view_queries_use_indexes(self):
+        """Запросы страниц не просматривают таблицы целиком
+           и не сортируют записи без индекса"""
+        Comment.objects.create(post=self.post2, author=self.user, text='Ок')
+        call_command('explain_views', stdout=StringIO())
+
+    def test_invalid_cursor_shows_first_page(self):
+        """Неверный курсор открывает первую страницу"""
+        response = self.guest_client.get(USER_URL, {'after': 'мусор'})
+        self.assertEqual(list(response.context['page']), [self.post])
+
+    def test_feed_page_runs_constant_number_of_queries(self):
+        """Страница ленты строится за постоянное число запросов"""
+        for i in range(10):
+            post = Post.objects.create(
+                text=f'Запись {i}', author=self.user2, group=self.group)
+            Comment.objects.create(post=post, author=self.user, text='Ок')
+        with self.assertNumQueries(4):
+            response = self.guest_client.get(GROUP_POST_URL)
+        self.assertContains(response, 'Комментариев: 1', count=10)
+
+    def test_feeds_take_counts_from_stats(self):
+        """Первые страницы лент берут число записей из счётчиков,
+           а не из COUNT(*)"""
+        for i in range(12):
+            Post.objects.create(
+                text=f'Запись {i}', author=self.user2, group=self.group)
+        cache.clear()
+        cases = (
+            (INDEX_URL, self.guest_client, 14),
+            (GROUP_POST_URL, self.guest_client, 13),
+            (FOLLOW_INDEX_URL, self.authorized_client, 13),
+        )
+        for url, client, count in cases:
+            with self.subTest(url=url), \
+                    CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            self.assertEqual(response.context['paginator'].count, count)
+            self.assertFalse(
+                [query['sql'] for query in queries
+                 if '"__count"' in query['sql']])
+
+    def test_index_cache_invalidated_by_new_post(self):
+        """Главная страница берётся из кэша до появления новой записи"""
+        self.guest_client.get(INDEX_URL)
+        cached = self.guest_client.get(INDEX_URL)
+        self.assertIsNone(cached.context)
+        post = Post.objects.create(text='Свежая запись', author=self.user2)
+        response = self.guest_client.get(INDEX_URL)
+        self.assertEqual(response.context['page'][0], post)
+
+    def test_feeds_follow_group_and_author_renames(self):
+        """Новое название группы и имя автора сразу видны на лентах"""
+        profile_url = reverse('profile', args=[USER])
+        self.guest_client.get(INDEX_URL)
+        self.guest_client.get(profile_url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        author = User.objects.get(pk=self.user2.pk)
+        author.username = 'renamed'
+        author.save()
+        response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, 'Новое название')
+        self.assertContains(response, '@renamed')
+        self.assertContains(
+            self.guest_client.get(profile_url), 'Новое название')
+        version = caching.versions('posts')
+        author.save()
+        self.assertEqual(caching.versions('posts'), version)
+
+    def test_post_card_cache_varies_and_invalidates(self):
+        """Карточка записи кэшируется отдельно для автора
+           и сбрасывается новым комментарием"""
+        response = self.authorized_client.get(self.VIEW_POST_URL)
+        self.assertContains(response, self.EDIT_POST_URL)
+        response = self.authorized_client2.get(self.VIEW_POST_URL)
+        self.assertNotContains(response, self.EDIT_POST_URL)
+        self.assertNotContains(response, 'Комментариев:')
+        Comment.objects.create(post=self.post, author=self.user2, text='Ок')
+        response = self.authorized_client2.get(self.VIEW_POST_URL)
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_thumbnail_placeholder_until_generated(self):
+        """Пока миниатюра не готова, карточка показывает заглушку"""
+        cache.clear()
+        response = self.guest_client.get(self.VIEW_POST_URL)
+        self.assertContains(response, 'card-img bg-light')
+        self.assertNotContains(response, '<img class="card-img"')
+        thumbnails.enqueue(self.post)
+        call_command('thumbnail_worker', once=True)
+        self.assertFalse(ThumbnailTask.objects.exists())
+        response = self.guest_client.get(self.VIEW_POST_URL)
+        self.assertContains(response, '<img class="card-img"')
+
+    def test_feed_shows_thumbnail_after_worker(self):
+        """После обработки очереди лента показывает миниатюру,
+           а не закэшированную заглушку"""
+        cache.clear()
+        response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, 'card-img bg-light')
+        thumbnails.enqueue(self.post)
+        call_command('thumbnail_worker', once=True)
+        response = self.guest_client.get(INDEX_URL)
+        self.assertContains(response, '<img class="card-img"')
+
+    def test_failed_thumbnail_task_is_retried(self):
+        """Неудачное задание остаётся в очереди и выполняется позже"""
+        thumbnails.enqueue(self.post)
+        with mock.patch.object(
+                thumbnails, 'generate', side_effect=OSError('диск')), \
+                self.assertLogs('posts.thumbnails', 'ERROR'):
+            self.assertEqual(thumbnails.process(), 1)
+        task = ThumbnailTask.objects.get(post=self.post)
+        self.assertEqual(task.attempts, 1)
+        self.assertGreater(task.available_at, timezone.now())
+        self.assertEqual(thumbnails.process(), 0)
+        task.available_at = timezone.now()
+        task.save()
+        self.assertEqual(thumbnails.process(), 1)
+        self.assertFalse(ThumbnailTask.objects.exists())
+
+    def test_thumbnail_variants_in_srcset(self):
+        """Обработчик создаёт варианты миниатюры, включая WebP,
+           и карточка перечисляет их в srcset"""
+        cache.clear()
+        thumbnails.enqueue(self.post)
+        call_command('thumbnail_worker', once=True)
+        sources = thumbnails.srcset(self.post.image, 'card')
+        # Исходник уже самой маленькой ширины: крупные варианты
+        # не создаются.
+        self.assertIn('.webp 480w', sources['webp'])
+        self.assertIn(' 480w', sources['jpeg'])
+        self.assertNotIn('1440w', sources['jpeg'])
+        self.assertNotIn('960w', sources['webp'])
+        response = self.guest_client.get(self.VIEW_POST_URL)
+        self.assertContains(
+            response, f'type="image/webp" srcset="{sources["webp"]}"')
+        self.assertContains(response, f'srcset="{sources["jpeg"]}"')
+
+    def test_search_finds_posts_by_words(self):
+        """Поиск находит записи по словам с учётом фильтров"""
+        found = Post.objects.create(
+            text='Кошки любят молоко', author=self.user2)
+        Post.objects.create(
+            text='Кошки', author=self.user2, group=self.second_group)
+        response = self.guest_client.get(SEARCH_URL, {'q': 'кошк молоко'})
+        self.assertEqual(list(response.context['page']), [found])
+        response = self.guest_client.get(
+            SEARCH_URL, {'q': 'кошки', 'group': SLUG2})
+        self.assertEqual(len(response.context['page']), 1)
+        found.delete()
+        response = self.guest_client.get(SEARCH_URL, {'q': 'молоко'})
+        self.assertEqual(len(response.context['page']), 0)
+
+    def test_search_pages_by_cursor(self):
+        """Результаты поиска листаются по курсору"""
+        for i in range(12):
+            Post.objects.create(text=f'Запись про море {i}', author=self.user)
+        first = self.guest_client.get(
+            SEARCH_URL, {'q': 'море'}).context['page']
+        second = self.guest_client.get(
+            SEARCH_URL, {'q': 'море', 'after': first.next_cursor}
+        ).context['page']
+        self.assertEqual(len(first), 10)
+        self.assertEqual(len(second), 2)
+        self.assertTrue(set(first).isdisjoint(second))
+
+    def test_comments_paged_in_order_with_authors(self):
+        """Комментарии выводятся по порядку страницами,
+           авторы загружаются тем же запросом"""
+        for i in range(25):
+            Comment.objects.create(
+                post=self.post2, author=self.user, text=f'Комментарий {i}')
+        with self.assertNumQueries(4):
+            response = self.guest_client.get(
+                reverse('post', args=[USER2, self.post2.id]))
+        first = response.context['comment_page']
+        self.assertEqual(
+            [comment.text for comment in first][:2],
+            ['Комментарий 0', 'Комментарий 1'])
+        self.assertEqual(len(first), 20)
+        more = reverse('post_comments', args=[USER2, self.post2.id])
+        response = self.guest_client.get(
+            more, {'after': first.next_cursor},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        second = response.context['comment_page']
+        self.assertEqual(len(second), 5)
+        self.assertFalse(second.has_next())
+        self.assertContains(response, 'Комментарий 24')
+        self.assertNotContains(response, '<form')
+
+    def test_load_more_without_script_opens_post_page(self):
+        """Без скрипта ссылка «Показать ещё» ведёт на страницу записи"""
+        more = reverse('post_comments', args=[USER, self.post.id])
+        response = self.guest_client.get(more, {'after': 'курсор'})
+        self.assertRedirects(
+            response, f'{self.VIEW_POST_URL}?after=%D0%BA%D1%83%D1%80'
+            f'%D1%81%D0%BE%D1%80')
+
+    def later(self, seconds):
+        """Сдвигает часы, по которым считается Last-Modified, вперёд:
+        страница, изменённая в текущую секунду, отдаётся без него.
+        Время изменения области, которого нет в кэше, тоже считается
+        текущим, поэтому страницу сначала нужно открыть без сдвига."""
+        clock = mock.Mock()
+        clock.time.return_value = time.time() + seconds
+        stack = ExitStack()
+        stack.enter_context(mock.patch('posts.caching.time', clock))
+        stack.enter_context(mock.patch('posts.conditional.time', clock))
+        return stack
+
+    def test_unchanged_pages_answer_not_modified(self):
+        """Неизменившиеся страницы отвечают 304 без построения страницы"""
+        urls = (GROUP_POST_URL, USER_URL, self.VIEW_POST_URL)
+        for url in urls:
+            self.authorized_client.get(url)
+            with self.subTest(url=url), self.later(5):
+                response = self.authorized_client.get(url)
+                self.assertEqual(
+                    response['Cache-Control'], 'private, no-cache')
+                cached = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(cached.status_code, 304)
+                self.assertIsNone(cached.context)
+                since = self.authorized_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(since.status_code, 304)
+
+    def test_page_modified_now_has_no_last_modified(self):
+        """Страница, изменённая в текущую секунду, отдаётся без
+           Last-Modified"""
+        response = self.guest_client.get(GROUP_POST_URL)
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_last_modified_moves_on_edit_and_delete(self):
+        """Правка записи и удаление самой новой записи сообщества
+           сдвигают Last-Modified вперёд"""
+        newest = Post.objects.create(
+            text='Новая', author=self.user, group=self.group)
+        url = reverse('post', args=[USER, self.post.id])
+        self.guest_client.get(url)
+        self.guest_client.get(GROUP_POST_URL)
+        with self.later(5):
+            since = self.guest_client.get(url)['Last-Modified']
+            group_since = self.guest_client.get(
+                GROUP_POST_URL)['Last-Modified']
+        with self.later(10):
+            self.post.text = 'Исправленный текст'
+            self.post.save()
+            newest.delete()
+        with self.later(15):
+            response = self.guest_client.get(
+                url, HTTP_IF_MODIFIED_SINCE=since)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'Исправленный текст')
+            response = self.guest_client.get(
+                GROUP_POST_URL, HTTP_IF_MODIFIED_SINCE=group_since)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotContains(response, 'Новая')
+
+    def test_validators_change_with_comments_and_viewer(self):
+        """ETag меняется с новым комментарием и с другим зрителем"""
+        etag = self.authorized_client.get(self.VIEW_POST_URL)['ETag']
+        guest = self.guest_client.get(
+            self.VIEW_POST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(guest.status_code, 200)
+        Comment.objects.create(post=self.post, author=self.user2, text='Ок')
+        response = self.authorized_client.get(
+            self.VIEW_POST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Ок')
+
+    def test_profile_validator_follows_follow_state(self):
+        """После подписки страница автора перестаёт совпадать с ETag"""
+        url = reverse('profile', args=[USER])
+        etag = self.authorized_client2.get(url)['ETag']
+        Follow.objects.create(user=self.user2, author=self.user)
+        response = self.authorized_client2.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['following'])
+
     def test_context_with_post_show_correct_context(self):
         """Шаблоны сформированы с правильным контекстом."""
         self.post2.delete()
@@ -116,3 +477,40 @@ class PostViewTest(TestCase):
                 response = self.guest_client.get(url)
                 post = response.context.get('page')[0]
                 self.assertEqual(post, self.post)
+
+
+class GroupDirectoryTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i:02}', slug=f'group-{i}')
+            for i in range(25)]
+        for group in cls.groups[3:6]:
+            Post.objects.create(text='Текст', author=cls.user, group=group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_directory_pages_by_title(self):
+        """Сообщества выводятся по названию постранично"""
+        response = Client().get(GROUPS_URL, {'page': 2})
+        page = response.context['page']
+        self.assertEqual(response.context['sort'], 'title')
+        self.assertEqual(
+            [stats.group for stats in page], self.groups[4::-1])
+        self.assertEqual(page.paginator.count, 25)
+
+    def test_directory_sorts_by_activity(self):
+        """Сначала выводятся сообщества с самыми свежими записями"""
+        response = Client().get(GROUPS_URL, {'sort': 'activity'})
+        groups = [stats.group for stats in response.context['page']]
+        self.assertEqual(groups[:3], self.groups[5:2:-1])
+        self.assertContains(response, 'Записей: 1', count=3)
+
+    def test_directory_runs_two_queries(self):
+        """Страница каталога стоит двух запросов: COUNT и выборки"""
+        client = Client()
+        with self.assertNumQueries(2):
+            client.get(GROUPS_URL, {'sort': 'activity', 'page': 2})
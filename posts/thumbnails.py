@@ -0,0 +1,150 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import caching
+from .models import Post, ThumbnailTask
+from .storage import post_images
+
+logger = logging.getLogger(__name__)
+
+
+class CachedThumbnailBackend(ThumbnailBackend):
+    def cached_thumbnail(self, file_, geometry_string, **options):
+        """Как get_thumbnail, но только ищет готовую миниатюру
+        и никогда не создаёт её в текущем запросе."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = CachedThumbnailBackend()
+
+
+def cached(image, spec):
+    geometry, options = settings.THUMBNAIL_SPECS[spec]
+    return backend.cached_thumbnail(image, geometry, **options)
+
+
+VARIANT_FORMATS = ('JPEG', 'WEBP')
+
+
+def variants(spec, max_width=None):
+    """Варианты миниатюры spec для srcset: (ширина, формат, геометрия,
+    параметры). Высота пропорциональна геометрии spec. Ширины больше
+    max_width пропускаются, кроме самой маленькой."""
+    geometry, options = settings.THUMBNAIL_SPECS[spec]
+    width, height = (int(side) for side in geometry.split('x'))
+    widths = sorted(settings.THUMBNAIL_WIDTHS)
+    for variant_width in widths:
+        if (max_width is not None and variant_width > max_width
+                and variant_width != widths[0]):
+            continue
+        variant_height = round(height * variant_width / width)
+        variant_geometry = f'{variant_width}x{variant_height}'
+        for format_ in VARIANT_FORMATS:
+            yield (variant_width, format_, variant_geometry,
+                   {**options, 'format': format_})
+
+
+def _source_width(name):
+    # Читается только заголовок файла, изображение не декодируется.
+    with post_images.open(name) as source, Image.open(source) as image:
+        return image.width
+
+
+def generate(name):
+    """Создаёт все миниатюры файла name и сбрасывает кэш страниц
+    с записями, которые его показывают: до этого там стоит заглушка."""
+    # Ключ миниатюры в sorl зависит от хранилища исходника, поэтому оно
+    # должно совпадать с хранилищем поля Post.image.
+    source = ImageFile(name, post_images)
+    source_width = _source_width(name)
+    for spec, (geometry, options) in settings.THUMBNAIL_SPECS.items():
+        default.backend.get_thumbnail(source, geometry, **options)
+        for _, _, geometry, options in variants(spec, source_width):
+            default.backend.get_thumbnail(source, geometry, **options)
+    scopes = set()
+    for post in Post.objects.filter(image=name).select_related('author'):
+        scopes.update(caching.post_scopes(post))
+    caching.bump(*scopes)
+
+
+def srcset(image, spec):
+    """Готовые варианты миниатюры по форматам: {'jpeg': '<url> 480w, ...',
+    'webp': ...}. Ещё не созданные варианты не попадают в списки."""
+    sources = {format_.lower(): [] for format_ in VARIANT_FORMATS}
+    for width, format_, geometry, options in variants(spec):
+        thumbnail = backend.cached_thumbnail(image, geometry, **options)
+        if thumbnail is not None:
+            sources[format_.lower()].append(f'{thumbnail.url} {width}w')
+    return {format_: ', '.join(urls) for format_, urls in sources.items()}
+
+
+def enqueue(post):
+    """Ставит создание всех миниатюр записи в очередь фонового
+    обработчика (manage.py thumbnail_worker)."""
+    if not post.image:
+        return
+    # Задание, которое уже выполняется для прежнего изображения, после
+    # сброса счётчика попыток не удалится и будет выполнено заново.
+    if not ThumbnailTask.objects.filter(post=post).update(
+            attempts=0, available_at=timezone.now()):
+        ThumbnailTask.objects.bulk_create(
+            [ThumbnailTask(post=post)], ignore_conflicts=True)
+
+
+def _claim(task):
+    """Берёт задание на время, которое растёт с каждой попыткой.
+    Если обработчик не справится или упадёт, задание вернётся
+    в очередь по истечении этого времени."""
+    now = timezone.now()
+    delay = settings.THUMBNAIL_RETRY_DELAY * 2 ** task.attempts
+    return ThumbnailTask.objects.filter(
+        pk=task.pk, attempts=task.attempts,
+        available_at=task.available_at,
+    ).update(attempts=F('attempts') + 1,
+             available_at=now + timedelta(seconds=delay))
+
+
+def process(batch_size=50):
+    """Выполняет задания из очереди и возвращает их число. Задание
+    удаляется только после успеха, неудачное повторяется до
+    THUMBNAIL_MAX_ATTEMPTS раз."""
+    done = 0
+    tasks = ThumbnailTask.objects.filter(
+        available_at__lte=timezone.now(),
+        attempts__lt=settings.THUMBNAIL_MAX_ATTEMPTS,
+    ).select_related('post')[:batch_size]
+    for task in tasks:
+        if not _claim(task):
+            continue
+        try:
+            if task.post.image:
+                generate(task.post.image.name)
+        except Exception:
+            logger.exception(
+                'Не удалось создать миниатюры для записи %s (попытка %s)',
+                task.post_id, task.attempts + 1)
+        else:
+            ThumbnailTask.objects.filter(
+                pk=task.pk, attempts=task.attempts + 1).delete()
+        done += 1
+    return done
@@ -0,0 +1,160 @@
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import stats
+from .models import Follow, Post, TimelineEntry, UserStats
+from .pagination import POSTS_PER_PAGE, CursorPaginator, paginate
+
+BATCH_SIZE = 500
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+
+
+def followers(author_id):
+    return Follow.objects.filter(author_id=author_id, user__isnull=False)
+
+
+def _heavy(prefix=''):
+    # Пока ленты подписчиков не дополнены, записи автора, как и записи
+    # популярных авторов, подмешиваются при чтении.
+    return (Q(**{f'{prefix}followers_count__gt':
+                 settings.TIMELINE_FANOUT_LIMIT})
+            | Q(**{f'{prefix}timeline_pending': True}))
+
+
+def is_heavy(author_id):
+    return UserStats.objects.filter(_heavy(), user_id=author_id).exists()
+
+
+def heavy_authors(user):
+    return list(Follow.objects.filter(
+        _heavy('author__stats__'), user=user,
+    ).values_list('author', flat=True))
+
+
+def fan_out(post):
+    if is_heavy(post.author_id):
+        return
+    entries = (
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers(post.author_id).values_list(
+            'user_id', flat=True)
+    )
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def _fill(follow):
+    posts = Post.objects.filter(author_id=follow.author_id).values_list(
+        'id', 'pub_date')
+    entries = (
+        TimelineEntry(user_id=follow.user_id, post_id=post_id,
+                      pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def backfill(follow):
+    if follow.user_id is None or is_heavy(follow.author_id):
+        return
+    _fill(follow)
+
+
+def author_lightened(author_id):
+    """Вызывается после отписки. Пока у автора было больше
+    TIMELINE_FANOUT_LIMIT подписчиков, его записи не раскладывались
+    по лентам, а новые подписки не получали старых записей. Когда
+    подписчиков становится ровно столько, сколько позволяет предел,
+    автор отмечается для backfill_pending, а до тех пор его записи
+    подмешиваются при чтении."""
+    UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT,
+    ).update(timeline_pending=True)
+
+
+def backfill_pending():
+    """Дополняет ленты подписчиков отмеченных авторов
+    (manage.py backfill_timelines). Каждый подписчик получает записи
+    отдельной вставкой. Автор, который снова стал популярным, просто
+    теряет отметку: при следующем спаде подписчиков она появится
+    снова. Возвращает число обработанных авторов."""
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    pending = UserStats.objects.filter(timeline_pending=True)
+    pending.filter(followers_count__gt=limit).update(timeline_pending=False)
+    done = 0
+    for author_id in list(pending.values_list('user_id', flat=True)):
+        started = timezone.now()
+        last = 0
+        for follow in followers(author_id).order_by('pk').iterator():
+            _fill(follow)
+            last = follow.pk
+        if not pending.filter(
+                user_id=author_id, followers_count__lte=limit,
+        ).update(timeline_pending=False):
+            continue
+        # Подписки и записи, появившиеся во время обхода, пропустили
+        # раскладку, пока отметка стояла.
+        for follow in followers(author_id).filter(pk__gt=last):
+            _fill(follow)
+        for post in Post.objects.filter(
+                author_id=author_id, pub_date__gte=started):
+            fan_out(post)
+        done += 1
+    return done
+
+
+def trim(follow):
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id).delete()
+
+
+def rebuild():
+    TimelineEntry.objects.all().delete()
+    for follow in Follow.objects.filter(user__isnull=False).iterator():
+        backfill(follow)
+
+
+def _entry_posts(page):
+    """Заменяет записи ленты на странице самими записями."""
+    posts = Post.objects.feed().in_bulk(
+        [entry.post_id for entry in page.object_list])
+    page.object_list = [
+        posts[entry.post_id] for entry in page.object_list
+        if entry.post_id in posts
+    ]
+    return page
+
+
+def _merged(user, heavy):
+    entries = TimelineEntry.objects.filter(user=user).values('post')
+    return Post.objects.filter(
+        Q(id__in=entries) | Q(author__in=heavy)).feed()
+
+
+def home_page(request, user):
+    """Страница ленты подписок. Без тяжёлых авторов лента листается
+    прямо по индексу TimelineEntry, и записи не приходится сортировать.
+    Курсоры в обоих случаях одинаковые: (pub_date, id записи)."""
+    heavy = heavy_authors(user)
+    count = stats.feed_total(user)
+    if heavy:
+        return paginate(request, _merged(user, heavy), count=count)
+    context = paginate(
+        request, TimelineEntry.objects.filter(user=user), count=count,
+        ordering=TIMELINE_ORDERING)
+    _entry_posts(context['page'])
+    return context
+
+
+def home_cursor_page(user, cursor=None, per_page=POSTS_PER_PAGE):
+    """То же, что home_page, но только по курсору."""
+    heavy = heavy_authors(user)
+    if heavy:
+        return CursorPaginator(_merged(user, heavy), per_page).get_page(
+            cursor)
+    return _entry_posts(CursorPaginator(
+        TimelineEntry.objects.filter(user=user), per_page,
+        TIMELINE_ORDERING).get_page(cursor))
@@ -0,0 +1,235 @@
+import json
+import os
+import shutil
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files import File
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from . import media, search, stats, timeline
+from .models import Comment, Follow, Group, Post, User
+from .storage import file_hash, post_images
+
+CHUNK_SIZE = 2000
+
+
+def _dump(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+def _image_ref(name, media_dir):
+    """Имя изображения в выгрузке: sha256 содержимого и расширение."""
+    if not name or not post_images.exists(name):
+        return None
+    with post_images.open(name) as source:
+        ref = file_hash(source) + os.path.splitext(name)[1].lower()
+        if media_dir:
+            target = os.path.join(media_dir, ref)
+            if not os.path.exists(target):
+                source.seek(0)
+                with open(target, 'wb') as copy:
+                    shutil.copyfileobj(source, copy)
+    return ref
+
+
+def export_records(media_dir=None):
+    """Порождает строки JSONL в порядке, нужном для загрузки:
+    сообщества, пользователи, записи, комментарии, подписки."""
+    if media_dir:
+        os.makedirs(media_dir, exist_ok=True)
+    groups = Group.objects.order_by('pk').values_list(
+        'slug', 'title', 'description')
+    for slug, title, description in groups.iterator(CHUNK_SIZE):
+        yield _dump({'type': 'group', 'slug': slug, 'title': title,
+                     'description': description})
+    users = User.objects.order_by('pk').values_list(
+        'username', 'first_name', 'last_name', 'email')
+    for username, first_name, last_name, email in users.iterator(CHUNK_SIZE):
+        yield _dump({'type': 'user', 'username': username,
+                     'first_name': first_name, 'last_name': last_name,
+                     'email': email})
+    posts = Post.objects.order_by('pk').values_list(
+        'author__username', 'group__slug', 'pub_date', 'text', 'image')
+    for author, group, pub_date, text, image in posts.iterator(CHUNK_SIZE):
+        yield _dump({'type': 'post', 'author': author, 'group': group,
+                     'pub_date': pub_date.isoformat(), 'text': text,
+                     'image': _image_ref(image, media_dir)})
+    comments = Comment.objects.order_by('pk').values_list(
+        'post__author__username', 'post__pub_date', 'author__username',
+        'created', 'text')
+    for post_author, post_date, author, created, text in comments.iterator(
+            CHUNK_SIZE):
+        yield _dump({'type': 'comment',
+                     'post': [post_author, post_date.isoformat()],
+                     'author': author, 'created': created.isoformat(),
+                     'text': text})
+    follows = Follow.objects.filter(
+        user__isnull=False, author__isnull=False
+    ).order_by('pk').values_list('user__username', 'author__username')
+    for user, author in follows.iterator(CHUNK_SIZE):
+        yield _dump({'type': 'follow', 'user': user, 'author': author})
+
+
+@contextmanager
+def original_dates():
+    """Отключает auto_now_add, чтобы сохранить даты из выгрузки."""
+    fields = [Post._meta.get_field('pub_date'),
+              Comment._meta.get_field('created')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _user_ids(usernames):
+    return dict(User.objects.filter(username__in=set(usernames))
+                .values_list('username', 'pk'))
+
+
+def _post_ids(keys):
+    posts = Post.objects.filter(
+        author__username__in={author for author, date in keys},
+        pub_date__in={date for author, date in keys},
+    ).values_list('author__username', 'pub_date', 'pk')
+    return {(author, date): pk for author, date, pk in posts}
+
+
+def _import_image(ref, media_dir):
+    if not ref:
+        return None
+    digest = os.path.splitext(ref)[0]
+    name = post_images.hashed_name(f'posts/{ref}', digest)
+    if not post_images.exists(name):
+        if not media_dir:
+            return None
+        with open(os.path.join(media_dir, ref), 'rb') as source:
+            name = post_images.save(name, File(source))
+    return name
+
+
+def _load_groups(records, media_dir):
+    Group.objects.bulk_create(
+        (Group(slug=r['slug'], title=r['title'],
+               description=r['description']) for r in records),
+        ignore_conflicts=True)
+
+
+def _load_users(records, media_dir):
+    existing = _user_ids(r['username'] for r in records)
+    password = make_password(None)
+    User.objects.bulk_create(
+        (User(username=r['username'], first_name=r['first_name'],
+              last_name=r['last_name'], email=r['email'], password=password)
+         for r in records if r['username'] not in existing),
+        ignore_conflicts=True)
+
+
+def _load_posts(records, media_dir):
+    for record in records:
+        record['pub_date'] = parse_datetime(record['pub_date'])
+    users = _user_ids(r['author'] for r in records)
+    groups = dict(Group.objects.filter(
+        slug__in={r['group'] for r in records if r['group']}
+    ).values_list('slug', 'pk'))
+    existing = _post_ids([(r['author'], r['pub_date']) for r in records])
+    Post.objects.bulk_create(
+        Post(author_id=users[r['author']], group_id=groups.get(r['group']),
+             pub_date=r['pub_date'], text=r['text'],
+             image=_import_image(r['image'], media_dir))
+        for r in records
+        if r['author'] in users
+        and (r['author'], r['pub_date']) not in existing
+    )
+
+
+def _comment_keys(posts, users, dates):
+    return set(Comment.objects.filter(
+        post_id__in=set(posts), author_id__in=set(users),
+        created__in=set(dates),
+    ).values_list('post_id', 'author_id', 'created'))
+
+
+def _load_comments(records, media_dir):
+    for record in records:
+        author, date = record['post']
+        record['post'] = (author, parse_datetime(date))
+        record['created'] = parse_datetime(record['created'])
+    posts = _post_ids([r['post'] for r in records])
+    users = _user_ids(r['author'] for r in records)
+    records = [
+        r for r in records if r['post'] in posts and r['author'] in users]
+    existing = _comment_keys(
+        (posts[r['post']] for r in records),
+        (users[r['author']] for r in records),
+        (r['created'] for r in records))
+    Comment.objects.bulk_create(
+        Comment(post_id=posts[r['post']], author_id=users[r['author']],
+                created=r['created'], text=r['text'])
+        for r in records
+        if (posts[r['post']], users[r['author']], r['created'])
+        not in existing
+    )
+
+
+def _load_follows(records, media_dir):
+    users = _user_ids(
+        name for r in records for name in (r['user'], r['author']))
+    pairs = {(users.get(r['user']), users.get(r['author'])) for r in records}
+    pairs = {(user, author) for user, author in pairs
+             if user and author and user != author}
+    existing = set(Follow.objects.filter(
+        user_id__in={user for user, author in pairs},
+        author_id__in={author for user, author in pairs},
+    ).values_list('user_id', 'author_id'))
+    Follow.objects.bulk_create(
+        Follow(user_id=user, author_id=author)
+        for user, author in pairs - existing)
+
+
+LOADERS = {
+    'group': _load_groups,
+    'user': _load_users,
+    'post': _load_posts,
+    'comment': _load_comments,
+    'follow': _load_follows,
+}
+
+
+def import_records(lines, media_dir=None, chunk_size=CHUNK_SIZE):
+    """Загружает строки JSONL пачками и возвращает число записей
+    каждого типа. Производные данные (счётчики, ленты, поисковый
+    индекс) пересчитываются один раз в конце."""
+    counts = dict.fromkeys(LOADERS, 0)
+    chunk, kind = [], None
+
+    def flush():
+        if chunk:
+            with transaction.atomic():
+                LOADERS[kind](chunk, media_dir)
+            counts[kind] += len(chunk)
+            chunk.clear()
+
+    with original_dates():
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('type') not in LOADERS:
+                raise ValueError(f'Неизвестный тип записи: {line.strip()}')
+            if record['type'] != kind or len(chunk) >= chunk_size:
+                flush()
+                kind = record['type']
+            chunk.append(record)
+        flush()
+    stats.recount()
+    media.recount()
+    timeline.rebuild()
+    search.rebuild()
+    cache.clear()
+    return counts
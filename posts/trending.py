@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import caching
+from .models import Group, GroupScore, Post, PostScore, TrendingEpoch
+from .pagination import POSTS_PER_PAGE
+
+POST_WEIGHT = 1.0
+COMMENT_WEIGHT = 1.0
+POSTS_LIMIT = 100
+GROUPS_LIMIT = 10
+# Оценки, которые к моменту сжатия опустились ниже этой, удаляются.
+MIN_SCORE = 0.01
+LANDMARK_KEY = 'trending:landmark'
+RANKED_KEY = 'trending:ranked'
+
+
+def landmark():
+    value = cache.get(LANDMARK_KEY)
+    if value is None:
+        epoch, _ = TrendingEpoch.objects.get_or_create(
+            pk=1, defaults={'landmark': timezone.now()})
+        value = epoch.landmark
+        cache.set(LANDMARK_KEY, value, None)
+    return value
+
+
+def weight(value, when):
+    """Вклад события при прямом затухании: value * 2^((when - L) / T),
+    где L — общая точка отсчёта. Все оценки отнесены к L, поэтому
+    событие добавляется простым сложением, а порядок хранимых оценок
+    в любой момент совпадает с порядком затухших."""
+    age = (when - landmark()).total_seconds()
+    return value * 2 ** (age / settings.TRENDING_HALF_LIFE)
+
+
+def _add(model, field, pk, amount):
+    if pk is None:
+        return
+    scores = model.objects.filter(**{field: pk})
+    if scores.update(score=F('score') + amount) or amount <= 0:
+        return
+    model.objects.get_or_create(**{field: pk})
+    scores.update(score=F('score') + amount)
+
+
+def post_created(post):
+    amount = weight(POST_WEIGHT, post.pub_date)
+    _add(PostScore, 'post_id', post.pk, amount)
+    _add(GroupScore, 'group_id', post.group_id, amount)
+
+
+def comment_added(comment, sign=1):
+    """sign=-1 убирает вклад удалённого комментария: он вычисляется
+    по той же формуле и после сжатия."""
+    amount = sign * weight(COMMENT_WEIGHT, comment.created)
+    _add(PostScore, 'post_id', comment.post_id, amount)
+    _add(GroupScore, 'group_id', comment.post.group_id, amount)
+
+
+def compact(now=None):
+    """Переносит точку отсчёта на now, чтобы оценки не росли без
+    предела, и удаляет угасшие. Возвращает число удалённых оценок."""
+    now = now or timezone.now()
+    removed = 0
+    with transaction.atomic():
+        epoch, _ = TrendingEpoch.objects.get_or_create(
+            pk=1, defaults={'landmark': now})
+        age = (now - epoch.landmark).total_seconds()
+        factor = 2 ** (-age / settings.TRENDING_HALF_LIFE)
+        for model in (PostScore, GroupScore):
+            model.objects.update(score=F('score') * factor)
+            removed += model.objects.filter(score__lt=MIN_SCORE).delete()[0]
+        epoch.landmark = now
+        epoch.save()
+    cache.set(LANDMARK_KEY, now, None)
+    return removed
+
+
+def refresh():
+    """Сохраняет в кэше готовые списки популярного: ключи записей
+    и сообществ в порядке убывания оценки."""
+    ranked = {
+        'posts': list(PostScore.objects.order_by('-score').values_list(
+            'post_id', flat=True)[:POSTS_LIMIT]),
+        'groups': list(GroupScore.objects.order_by('-score').values_list(
+            'group_id', flat=True)[:GROUPS_LIMIT]),
+    }
+    cache.set(RANKED_KEY, ranked, None)
+    caching.bump('trending')
+    return ranked
+
+
+def ranked():
+    return cache.get(RANKED_KEY) or refresh()
+
+
+def _in_order(queryset, ids):
+    found = queryset.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
+
+
+def page(request):
+    paginator = Paginator(ranked()['posts'], POSTS_PER_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
+    page.object_list = _in_order(Post.objects.feed(), page.object_list)
+    return {'page': page, 'paginator': paginator}
+
+
+def groups():
+    return _in_order(Group.objects.all(), ranked()['groups'])
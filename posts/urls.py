@@ -13,6 +13,16 @@ urlpatterns = [
         views.groups,
         name='allgroups'
         ),
+    path(
+        'trending/',
+        views.trending_posts,
+        name='trending'
+        ),
+    path(
+        'search/',
+        views.post_search,
+        name='post_search'
+        ),
     path(
         'new/',
         views.new_post,
@@ -23,6 +33,11 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
         ),
+    path(
+        '<str:username>/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+        ),
     path(
         '<str:username>/<int:post_id>/',
         views.post_view,
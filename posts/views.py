@@ -1,64 +1,139 @@
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.views.decorators.cache import cache_page
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 
+from yatube.db import serialized_write
+
+from . import (caching, conditional, search, stats, suggestions, thumbnails,
+               timeline, trending)
+from .caching import cache_feed
+from .conditional import conditional_page
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Follow, Group, GroupStats, Post, User
+from .pagination import (COMMENTS_ORDERING, COMMENTS_PER_PAGE,
+                         GROUP_ORDERINGS, GROUPS_PER_PAGE, CursorPaginator,
+                         paginate)
 
 
-@cache_page(20)
+@cache_feed(lambda request: ['posts'])
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
-        request, "index.html",
-        {'page': page, 'paginator': paginator})
+    post_list = Post.objects.feed()
+    return render(request, "index.html", paginate(
+        request, post_list, count=stats.posts_total()))
 
 
+@conditional_page(conditional.group_state)
+@cache_feed(lambda request, slug: [f'group:{slug}'])
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    group_posts = group.posts.all()
-    paginator = Paginator(group_posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
-        request, "group.html",
-        {"group": group, 'page': page, 'paginator': paginator})
+    group = get_object_or_404(
+        Group.objects.select_related('stats'), slug=slug)
+    group_posts = group.posts.feed()
+    return render(request, "group.html", {
+        "group": group,
+        **paginate(request, group_posts,
+                   count=stats.for_group(group).posts_count)})
+
+
+@cache_feed(lambda request: ['posts', 'trending'])
+def trending_posts(request):
+    return render(request, 'trending.html', {
+        'groups': trending.groups(),
+        **trending.page(request)})
 
 
 def groups(request):
-    groups = Group.objects.order_by("-title")[:15]
-    return render(request, "allgroups.html", {"groups": groups})
+    sort = request.GET.get('sort')
+    if sort not in GROUP_ORDERINGS:
+        sort = 'title'
+    # Счётчики хранятся в GroupStats, поэтому страница — это COUNT
+    # и одна выборка с присоединёнными сообществами.
+    directory = GroupStats.objects.select_related('group').order_by(
+        *GROUP_ORDERINGS[sort])
+    paginator = Paginator(directory, GROUPS_PER_PAGE)
+    return render(request, "allgroups.html", {
+        'sort': sort,
+        'paginator': paginator,
+        'page': paginator.get_page(request.GET.get('page'))})
 
 
+@conditional_page(conditional.profile_state)
+@cache_feed(caching.profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User.objects, username=username)
-    author_posts = author.posts.all()
-    paginator = Paginator(author_posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    author_stats = stats.for_user(author)
+    author_posts = author.posts.feed()
     following = request.user.is_authenticated and Follow.objects.filter(
         author=author, user=request.user).exists()
     return render(request, 'profile.html', {
         'author': author,
-        'page': page,
-        'paginator': paginator,
-        'following': following})
+        'stats': author_stats,
+        'following': following,
+        'suggestions': suggestions.for_user(request.user, exclude=author),
+        **paginate(request, author_posts, count=author_stats.posts_count)})
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    group = author = None
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    page = None
+    if query:
+        page = search.search(
+            query, group=group, author=author,
+            cursor=request.GET.get('after'))
+    return render(request, 'search.html', {
+        'query': query,
+        'group': group,
+        'author': author,
+        'groups': Group.objects.order_by('title'),
+        'page': page})
+
 
+def comments_page(post, cursor=None):
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_PER_PAGE, COMMENTS_ORDERING)
+    return paginator.get_page(cursor)
 
+
+@conditional_page(conditional.post_state)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = get_object_or_404(
+        Post.objects.feed(), id=post_id, author__username=username)
     form = CommentForm()
     return render(request, 'post.html', {
         'form': form,
         'post': post,
-        'author': post.author}
+        'author': post.author,
+        'comments': post.comments.all(),
+        'comment_page': comments_page(post, request.GET.get('after'))}
     )
 
 
+def post_comments(request, username, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        id=post_id, author__username=username)
+    if not request.is_ajax():
+        url = reverse('post', args=[username, post_id])
+        return redirect(f'{url}?{request.GET.urlencode()}')
+    return render(request, 'comment_list.html', {
+        'post': post,
+        'comment_page': comments_page(post, request.GET.get('after'))})
+
+
+@serialized_write
+def save_post(post, image_changed):
+    post.save()
+    if image_changed:
+        thumbnails.enqueue(post)
+
+
 @login_required
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, id=post_id, author__username=username)
@@ -71,7 +146,9 @@ def post_edit(request, username, post_id):
         )
     if not form.is_valid():
         return render(request, "new.html", {'form': form, 'post': post})
-    form.save()
+    post = form.save(commit=False)
+    form.store_image()
+    save_post(post, 'image' in form.changed_data)
     return redirect('post', post.author.username, post_id)
 
 
@@ -82,7 +159,8 @@ def new_post(request):
         return render(request, "new.html", {'form': form})
     new_post = form.save(commit=False)
     new_post.author = request.user
-    new_post.save()
+    form.store_image()
+    save_post(new_post, True)
     return redirect('index')
 
 
@@ -95,22 +173,21 @@ def add_comment(request, username, post_id):
     comment = form.save(commit=False)
     comment.author = request.user
     comment.post = post
-    comment.save()
+    serialized_write(comment.save)()
     return redirect('post', username, post_id)
 
 
 @login_required
+@cache_feed(lambda request: [
+    'posts', 'suggestions', f'follow:{request.user.pk}'])
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
-        request, "follow.html",
-        {'page': page, 'paginator': paginator})
+    return render(request, "follow.html", {
+        'suggestions': suggestions.for_user(request.user),
+        **timeline.home_page(request, request.user)})
 
 
 @login_required
+@serialized_write
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if (
@@ -123,6 +200,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@serialized_write
 def profile_unfollow(request, username):
     follow = get_object_or_404(
         Follow,
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который отдаёт AuthenticationMiddleware пользователя
+    из кэша. Кэш обновляют сигналы users.signals при каждом сохранении
+    пользователя, поэтому смена пароля и блокировка действуют сразу."""
+
+    def get_user(self, user_id):
+        key = cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            # add, а не set: запись из сигнала свежее прочитанной здесь.
+            cache.add(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import cache_key
+
+User = get_user_model()
+
+
+def _store(user_id):
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None:
+        cache.set(cache_key(user_id), user, settings.USER_CACHE_TIMEOUT)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, raw=False, **kwargs):
+    # Сразу убираем старую копию, а после фиксации транзакции кладём
+    # в кэш строку из базы: её уже не перепишет параллельный get_user.
+    cache.delete(cache_key(instance.pk))
+    if not raw:
+        transaction.on_commit(lambda: _store(instance.pk))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    cache.delete(cache_key(instance.pk))
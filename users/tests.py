@@ -1,3 +1,72 @@
-from django.test import TestCase
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from posts.models import User
+from users.backends import cache_key
+
+INDEX_URL = reverse('index')
+
+
+class CachedAuthTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reader', password='old-password')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def request_user(self):
+        request = RequestFactory().get(INDEX_URL)
+        request.session = SessionStore(self.client.session.session_key)
+        return auth.get_user(request)
+
+    def test_authenticated_request_skips_database(self):
+        """Сессия и пользователь берутся из кэша без запросов к базе"""
+        self.assertEqual(self.request_user(), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.request_user(), self.user)
+
+    def test_password_change_ends_other_sessions(self):
+        """После смены пароля старые сессии перестают действовать"""
+        self.request_user()
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertIsInstance(self.request_user(), AnonymousUser)
+
+    def test_password_change_keeps_current_session(self):
+        """Сессия, в которой сменили пароль, остаётся активной"""
+        response = self.client.post(reverse('password_change'), {
+            'old_password': 'old-password',
+            'new_password1': 'Xj3-long-new-pass',
+            'new_password2': 'Xj3-long-new-pass',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.request_user(), self.user)
+
+    def test_deactivated_user_logged_out(self):
+        """Заблокированный пользователь не проходит проверку из кэша"""
+        self.request_user()
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsInstance(self.request_user(), AnonymousUser)
+
+    def test_logout_removes_cached_session(self):
+        """Выход удаляет сессию из кэша и из базы"""
+        session_key = self.client.session.session_key
+        self.request_user()
+        self.client.get(reverse('logout'))
+        self.assertFalse(SessionStore().exists(session_key))
+        request = RequestFactory().get(INDEX_URL)
+        request.session = SessionStore(session_key)
+        self.assertIsInstance(auth.get_user(request), AnonymousUser)
+
+    def test_deleted_user_removed_from_cache(self):
+        """Удалённый пользователь не остаётся в кэше"""
+        self.request_user()
+        self.assertIsNotNone(cache.get(cache_key(self.user.pk)))
+        self.user.delete()
+        self.assertIsNone(cache.get(cache_key(self.user.pk)))
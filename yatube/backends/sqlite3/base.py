@@ -0,0 +1,14 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite, в котором транзакции начинаются с BEGIN IMMEDIATE.
+
+    Отложенная транзакция берёт блокировку записи только на первой
+    записи и, если другой процесс уже пишет, сразу получает
+    "database is locked" без ожидания busy_timeout. Немедленная
+    транзакция ждёт блокировку в начале, пока ещё ничего не прочитано.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
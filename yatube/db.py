@@ -0,0 +1,161 @@
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import (DEFAULT_DB_ALIAS, DatabaseError, OperationalError,
+                       connection, connections, transaction)
+from django.utils import timezone
+
+from posts.models import Heartbeat
+
+HEARTBEAT_INTERVAL = 1
+
+_local = threading.local()
+_health = {}
+_last_beat = 0.0
+_writer = threading.Lock()
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created: выполняет PRAGMA из
+    SQLITE_PRAGMAS на каждом новом соединении с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def _locked(error):
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+
+def serialized_write(func):
+    """Выполняет func в транзакции, по одной за раз на процесс.
+    Если база занята другим процессом, транзакция откатывается
+    и повторяется до WRITE_RETRIES раз с растущей случайной задержкой
+    от WRITE_RETRY_DELAY секунд.
+
+    Блокировка держится всё время func, поэтому в ней должна быть
+    только запись в базу: проверка форм, обработка изображений
+    и запись файлов делаются до вызова.
+    """
+    atomic_func = transaction.atomic(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not settings.SERIALIZE_WRITES:
+            return atomic_func(*args, **kwargs)
+        for attempt in range(settings.WRITE_RETRIES + 1):
+            try:
+                with _writer:
+                    return atomic_func(*args, **kwargs)
+            except OperationalError as error:
+                if (not _locked(error) or connection.in_atomic_block
+                        or attempt == settings.WRITE_RETRIES):
+                    raise
+            delay = settings.WRITE_RETRY_DELAY * 2 ** attempt
+            time.sleep(random.uniform(delay / 2, delay))
+    return wrapper
+
+
+def reset(pinned=False):
+    """Начинает учёт для нового запроса. pinned отправляет все его
+    чтения в основную базу."""
+    _local.pinned = pinned
+    _local.wrote = False
+    _local.replica_reads = 0
+
+
+def pinned():
+    return getattr(_local, 'pinned', False)
+
+
+def wrote():
+    """Была ли в этом потоке запись после reset()."""
+    return getattr(_local, 'wrote', False)
+
+
+def replica_reads():
+    return getattr(_local, 'replica_reads', 0)
+
+
+def beat():
+    """Обновляет отметку на основной базе не чаще раза в секунду."""
+    global _last_beat
+    now = time.monotonic()
+    if now - _last_beat < HEARTBEAT_INTERVAL:
+        return
+    _last_beat = now
+    Heartbeat.objects.update_or_create(
+        pk=1, defaults={'beat': timezone.now()})
+
+
+def replica_lag(alias):
+    """Отставание реплики в секундах или None, если реплика недоступна
+    или ещё не получила ни одной отметки."""
+    primary = Heartbeat.objects.using(DEFAULT_DB_ALIAS).values_list(
+        'beat', flat=True).first()
+    try:
+        replica = Heartbeat.objects.using(alias).values_list(
+            'beat', flat=True).first()
+    except DatabaseError:
+        return None
+    if primary is None:
+        return 0.0
+    if replica is None:
+        return None
+    return max((primary - replica).total_seconds(), 0.0)
+
+
+def healthy(alias):
+    """Отстаёт ли реплика не больше REPLICA_MAX_LAG. Результат
+    проверки хранится REPLICA_CHECK_INTERVAL секунд."""
+    now = time.monotonic()
+    checked, ok = _health.get(alias, (None, False))
+    interval = settings.REPLICA_CHECK_INTERVAL
+    if checked is not None and now - checked < interval:
+        return ok
+    lag = replica_lag(alias)
+    ok = lag is not None and lag <= settings.REPLICA_MAX_LAG
+    _health[alias] = (now, ok)
+    return ok
+
+
+class ReplicaRouter:
+    """Отправляет чтения на реплики из DATABASE_REPLICAS, а запись —
+    в основную базу. Реплика, которая отстала больше REPLICA_MAX_LAG,
+    не используется. После первой записи в потоке все его чтения идут
+    в основную базу: так пишущий сразу видит своё. Чтения внутри
+    транзакции тоже идут в основную базу: по ним решается, что
+    записать, и устаревшая реплика привела бы к ошибке записи.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (not settings.DATABASE_REPLICAS or pinned()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        replicas = [
+            alias for alias in settings.DATABASE_REPLICAS if healthy(alias)]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        _local.replica_reads = replica_reads() + 1
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if settings.DATABASE_REPLICAS:
+            _local.pinned = True
+            _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,195 @@
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.template.backends.django import Template
+
+from . import db
+
+logger = logging.getLogger('yatube.requests')
+
+_local = threading.local()
+_MISSING = object()
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'cache_hits', 'cache_misses',
+                 'template_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+
+
+def current():
+    """Счётчики запроса, который обрабатывается в этом потоке."""
+    return getattr(_local, 'metrics', None)
+
+
+def _time_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics = current()
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_time += time.perf_counter() - start
+
+
+def _count_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, _MISSING, version)
+        metrics = current()
+        if metrics is not None:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _count_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        found = get_many(self, keys, version)
+        metrics = current()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _time_render(render):
+    @wraps(render)
+    def wrapper(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return render(self, context, request)
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+    wrapper.instrumented = True
+    return wrapper
+
+
+def instrument():
+    """Один раз на процесс оборачивает чтение из кэшей и отрисовку
+    шаблонов. Вне запроса обёртки только проверяют current()."""
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if not getattr(backend.get, 'instrumented', False):
+            backend.get = _count_get(backend.get)
+        # Базовый get_many вызывает get, поэтому считается через него.
+        if (backend.get_many is not BaseCache.get_many
+                and not getattr(backend.get_many, 'instrumented', False)):
+            backend.get_many = _count_get_many(backend.get_many)
+    if not getattr(Template.render, 'instrumented', False):
+        Template.render = _time_render(Template.render)
+
+
+def _milliseconds(seconds):
+    return round(seconds * 1000, 2)
+
+
+class ServerTimingMiddleware:
+    """Для каждого запроса считает запросы к базе и их время,
+    попадания и промахи кэша, время отрисовки шаблонов (вместе
+    с запросами, которые выполняются при отрисовке) и общее время.
+
+    Результат отдаётся в заголовке Server-Timing и пишется одной
+    строкой JSON в журнал yatube.requests с именем адреса.
+    Middleware должен стоять первым в MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument()
+
+    def __call__(self, request):
+        metrics = _local.metrics = RequestMetrics()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_time_query))
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        total = time.perf_counter() - start
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={_milliseconds(metrics.db_time)};'
+            f'desc="{metrics.queries} queries"',
+            f'cache;desc="{metrics.cache_hits} hits, '
+            f'{metrics.cache_misses} misses"',
+            f'tpl;dur={_milliseconds(metrics.template_time)}',
+            f'total;dur={_milliseconds(total)}',
+        ])
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'view': match.view_name if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': _milliseconds(total),
+            'db_queries': metrics.queries,
+            'db_ms': _milliseconds(metrics.db_time),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+            'template_ms': _milliseconds(metrics.template_time),
+        }, ensure_ascii=False, separators=(',', ':')))
+        return response
+
+
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class PrimaryPinMiddleware:
+    """Когда настроены реплики, после запроса с записью ставит куку,
+    которая PRIMARY_PIN_SECONDS секунд отправляет чтения этого клиента
+    в основную базу, пока реплики не догонят его запись. Запросы
+    с изменяющими методами (POST и другие) читают только из основной
+    базы: их чтения решают, что записать.
+    Должен стоять перед SessionMiddleware: сохранение сессии — тоже
+    запись.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db.reset()
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        db.reset(pinned=PIN_COOKIE in request.COOKIES
+                 or request.method not in SAFE_METHODS)
+        try:
+            response = self.get_response(request)
+            if db.wrote():
+                db.beat()
+                response.set_cookie(
+                    PIN_COOKIE, '1', max_age=settings.PRIMARY_PIN_SECONDS,
+                    httponly=True, samesite='Lax')
+        finally:
+            db.reset()
+        return response
@@ -1,4 +1,5 @@
 import os
+import sys
 
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -15,9 +16,19 @@ ALLOWED_HOSTS = [
     "testserver",
 ]
 
+# Тесты очищают кэш, поэтому у них свой файл: общий кэш страниц
+# и сессий узла они не трогают.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.sqlite_cache.SQLiteCache',
+        'LOCATION': os.path.join(
+            BASE_DIR, 'cache', 'test.sqlite3' if TESTING else 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
 
@@ -39,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.middleware.ServerTimingMiddleware',
+    'yatube.middleware.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,11 +86,44 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite с транзакциями BEGIN IMMEDIATE.
+        'ENGINE': 'yatube.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            # Столько секунд соединение ждёт блокировку записи.
+            'timeout': 5,
+        },
     }
 }
 
+# PRAGMA для каждого соединения с SQLite. В режиме WAL читатели
+# не ждут писателя; synchronous = NORMAL в WAL не теряет целостность,
+# но последние транзакции могут пропасть при отключении питания;
+# cache_size отрицательный — в КиБ.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+# Представления с записью выполняются по одному за раз в процессе,
+# а при "database is locked" повторяются с задержкой.
+SERIALIZE_WRITES = True
+WRITE_RETRIES = 5
+WRITE_RETRY_DELAY = 0.05
+
+# Реплики только для чтения: псевдонимы из DATABASES. Чтения уходят
+# на реплики, которые отстают не больше REPLICA_MAX_LAG секунд
+# (отставание проверяется раз в REPLICA_CHECK_INTERVAL секунд).
+# Клиент, который что-то записал, PRIMARY_PIN_SECONDS секунд читает
+# из основной базы, поэтому это время не меньше допустимого отставания.
+DATABASE_ROUTERS = ['yatube.db.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_MAX_LAG = 5
+REPLICA_CHECK_INTERVAL = 1
+PRIMARY_PIN_SECONDS = 10
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -116,7 +162,77 @@ STATICFILES_DIRS = (os.path.join('static'), )
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'requests': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': os.path.join(BASE_DIR, 'requests.log'),
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'yatube.requests': {
+            'handlers': ['requests'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Сессии и пользователь запроса читаются из кэша, база нужна
+# только при промахе и записи.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CachedModelBackend',
+    # Для сессий, открытых до появления CachedModelBackend.
+    'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE_TIMEOUT = 60 * 60
+
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
 
 SITE_ID = 1
+
+# Авторы с большим числом подписчиков не раскладываются по лентам,
+# их записи подмешиваются в ленту подписок при чтении. Когда автор
+# опускается до предела, ленты его подписчиков дополняет
+# manage.py backfill_timelines, его стоит запускать раз в несколько минут.
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Кэш лент сбрасывается сигналами, поэтому его можно хранить долго.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Миниатюры, которые используют шаблоны: имя -> (геометрия, параметры).
+THUMBNAIL_SPECS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Неудачное задание на миниатюры повторяется через THUMBNAIL_RETRY_DELAY
+# секунд, с каждой попыткой вдвое позже, всего до THUMBNAIL_MAX_ATTEMPTS.
+THUMBNAIL_RETRY_DELAY = 60
+THUMBNAIL_MAX_ATTEMPTS = 5
+
+# Популярность записей и сообществ убывает вдвое за это число секунд.
+# manage.py update_trending пересчитывает список популярного, его стоит
+# запускать раз в несколько минут.
+TRENDING_HALF_LIFE = 60 * 60 * 12
+
+# Карточки записей и переключатель страниц в лентах отрисовываются
+# кодом из posts/cards.py, а не шаблонами post_item.html и paginator.html.
+COMPILED_CARDS = True
+
+# Ширины вариантов миниатюр для srcset, каждый в JPEG и WebP.
+THUMBNAIL_WIDTHS = (480, 960, 1440)
+
+# Загруженные изображения уменьшаются и сохраняются заново.
+IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+IMAGE_MAX_SIDE = 2560
+IMAGE_QUALITY = 85
+
+# Файл изображения без ссылок удаляется (manage.py collect_media)
+# не раньше, чем через столько секунд.
+MEDIA_GC_GRACE = 60 * 60 * 24
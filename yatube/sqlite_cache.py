@@ -0,0 +1,243 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS cache_entries (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL,
+        size INTEGER NOT NULL
+    )''',
+    '''CREATE INDEX IF NOT EXISTS cache_entries_accessed
+        ON cache_entries (accessed)''',
+    '''CREATE TABLE IF NOT EXISTS cache_usage (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        entries INTEGER NOT NULL,
+        size INTEGER NOT NULL
+    )''',
+    'INSERT OR IGNORE INTO cache_usage VALUES (0, 0, 0)',
+    '''CREATE TRIGGER IF NOT EXISTS cache_entries_insert
+        AFTER INSERT ON cache_entries BEGIN
+            UPDATE cache_usage
+            SET entries = entries + 1, size = size + new.size;
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS cache_entries_delete
+        AFTER DELETE ON cache_entries BEGIN
+            UPDATE cache_usage
+            SET entries = entries - 1, size = size - old.size;
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS cache_entries_update
+        AFTER UPDATE OF size ON cache_entries BEGIN
+            UPDATE cache_usage SET size = size - old.size + new.size;
+        END''',
+)
+
+UPSERT = '''
+    INSERT INTO cache_entries (key, value, expires, accessed, size)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        value = excluded.value,
+        expires = excluded.expires,
+        accessed = excluded.accessed,
+        size = excluded.size
+'''
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite в режиме WAL, общий для всех процессов узла.
+
+    Размер ограничен параметрами MAX_ENTRIES и MAX_SIZE (в байтах),
+    при переполнении вытесняются давно не читавшиеся записи.
+    Время чтения записи обновляется не чаще раза в ACCESS_RESOLUTION
+    секунд, чтобы чтение почти никогда не требовало записи в файл.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 256 * 1024 * 1024))
+        self._access_resolution = float(
+            options.get('ACCESS_RESOLUTION', 60))
+        self._busy_timeout = float(options.get('TIMEOUT', 5))
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=self._busy_timeout,
+                isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _write(self):
+        return _Transaction(self._connection())
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _live(self, connection, keys, now):
+        placeholders = ', '.join('?' * len(keys))
+        rows = connection.execute(
+            f'SELECT key, value, expires, accessed FROM cache_entries '
+            f'WHERE key IN ({placeholders})', keys).fetchall()
+        live, stale, touched = {}, [], []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                stale.append(key)
+                continue
+            live[key] = value
+            if accessed < now - self._access_resolution:
+                touched.append(key)
+        if stale or touched:
+            with self._write() as cursor:
+                cursor.executemany(
+                    'DELETE FROM cache_entries WHERE key = ? '
+                    'AND expires <= ?', [(key, now) for key in stale])
+                cursor.executemany(
+                    'UPDATE cache_entries SET accessed = ? WHERE key = ?',
+                    [(now, key) for key in touched])
+        return live
+
+    def _store(self, cursor, key, value, timeout):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        cursor.execute(UPSERT, (
+            key, blob, self.get_backend_timeout(timeout), time.time(),
+            len(blob)))
+
+    def _cull(self, cursor):
+        now = time.time()
+        entries, size = cursor.execute(
+            'SELECT entries, size FROM cache_usage').fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        cursor.execute(
+            'DELETE FROM cache_entries WHERE expires <= ?', (now,))
+        batch = max(1, self._max_entries // self._cull_frequency)
+        while True:
+            entries, size = cursor.execute(
+                'SELECT entries, size FROM cache_usage').fetchone()
+            if entries <= self._max_entries and size <= self._max_size:
+                return
+            cursor.execute(
+                'DELETE FROM cache_entries WHERE key IN ('
+                'SELECT key FROM cache_entries ORDER BY accessed LIMIT ?)',
+                (batch,))
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        live = self._live(self._connection(), [key], time.time())
+        if key not in live:
+            return default
+        return pickle.loads(live[key])
+
+    def get_many(self, keys, version=None):
+        mapping = {self._key(key, version): key for key in keys}
+        if not mapping:
+            return {}
+        live = self._live(self._connection(), list(mapping), time.time())
+        return {
+            mapping[key]: pickle.loads(value) for key, value in live.items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as cursor:
+            self._store(cursor, key, value, timeout)
+            self._cull(cursor)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._write() as cursor:
+            for key, value in data.items():
+                self._store(cursor, self._key(key, version), value, timeout)
+            self._cull(cursor)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as cursor:
+            row = cursor.execute(
+                'SELECT expires FROM cache_entries WHERE key = ?',
+                (key,)).fetchone()
+            if row and (row[0] is None or row[0] > time.time()):
+                return False
+            self._store(cursor, key, value, timeout)
+            self._cull(cursor)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._write() as cursor:
+            row = cursor.execute(
+                'SELECT value, expires FROM cache_entries WHERE key = ?',
+                (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            cursor.execute(
+                'UPDATE cache_entries SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?', (blob, len(blob), time.time(), key))
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as cursor:
+            cursor.execute(
+                'UPDATE cache_entries SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()))
+            return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._live(self._connection(), [key], time.time())
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._write() as cursor:
+            cursor.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        with self._write() as cursor:
+            cursor.executemany(
+                'DELETE FROM cache_entries WHERE key = ?',
+                [(self._key(key, version),) for key in keys])
+
+    def clear(self):
+        with self._write() as cursor:
+            cursor.execute('DELETE FROM cache_entries')
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время работы процесса: открывать файл
+        # заново на каждый запрос дороже, чем держать его открытым.
+        pass
+
+
+class _Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection.cursor()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
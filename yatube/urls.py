@@ -20,6 +20,7 @@ urlpatterns = [
     path('about-spec/', views.flatpage, {'url': '/about-spec/'}, name='spec'),
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
+    path("api/v1/", include("posts.api_urls")),
     path("", include("posts.urls")),
 ]
 